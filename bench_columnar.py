@@ -0,0 +1,64 @@
+import os
+import sys
+import json
+import time
+import resource
+import tempfile
+import subprocess
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+ROWS = 4_000_000
+COLUMNS = 24
+ROW_GROUP_SIZE = 500_000
+PREVIEW_COLUMNS = ['col_0', 'col_5', 'col_10']
+
+def write_dataset(path: str):
+    # Written one row group at a time so generating the file does not need it all in memory
+    schema = pa.schema([(f'col_{i}', pa.float64() if i % 3 else pa.string()) for i in range(COLUMNS)])
+    with pq.ParquetWriter(path, schema) as writer:
+        for start in range(0, ROWS, ROW_GROUP_SIZE):
+            ids = pa.array(range(start, start + ROW_GROUP_SIZE))
+            columns = [pc.cast(ids, pa.string()) if i % 3 == 0 else pc.multiply(pc.cast(ids, pa.float64()), i + 0.5)
+                       for i in range(COLUMNS)]
+            writer.write_table(pa.Table.from_arrays(columns, schema=schema), row_group_size=ROW_GROUP_SIZE)
+
+def run_case(case: str, path: str) -> dict:
+    sys.argv = sys.argv[:1]
+    import fs3
+    start = time.perf_counter()
+    if case == 'preview':
+        summary = fs3.read_columnar_summary(path, fs3.PARQUET_TYPE)
+        rows = fs3.read_columnar_rows(summary, 0, PREVIEW_COLUMNS)
+        row_group = summary['metadata'].row_group(0)
+        touched = summary['metadata'].serialized_size + sum(
+            row_group.column(i).total_compressed_size for i in range(row_group.num_columns)
+            if row_group.column(i).path_in_schema in PREVIEW_COLUMNS)
+    else:
+        rows = pq.read_table(path).slice(0, fs3.COLUMNAR_PREVIEW_ROWS).to_pylist()
+        touched = os.path.getsize(path)
+    elapsed = time.perf_counter() - start
+    return {'case': case, 'seconds': elapsed, 'rows': len(rows), 'bytes_touched': touched,
+            'arrow_peak': pa.default_memory_pool().max_memory(),
+            'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.parquet')
+        write_dataset(path)
+        print(f"{ROWS:,} rows x {COLUMNS} columns, {os.path.getsize(path) / 2**20:.1f} MB on disk")
+        print(f"{'case':>8} {'latency (s)':>12} {'touched (MB)':>13} {'arrow peak (MB)':>16} {'max RSS (MB)':>13}")
+        for case in ('preview', 'full'):
+            # Each case runs in a fresh interpreter so peak memory is not shared between them
+            out = subprocess.run([sys.executable, __file__, case, path], capture_output=True, text=True, check=True, cwd=tmp)
+            result = json.loads(out.stdout.strip().splitlines()[-1])
+            print(f"{case:>8} {result['seconds']:>12.3f} {result['bytes_touched'] / 2**20:>13.1f} "
+                  f"{result['arrow_peak'] / 2**20:>16.1f} {result['max_rss_kb'] / 1024:>13.1f}")
+
+if __name__ == '__main__':
+    if len(sys.argv) == 3:
+        print(json.dumps(run_case(sys.argv[1], sys.argv[2])))
+    else:
+        main()
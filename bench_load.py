@@ -0,0 +1,366 @@
+import os
+import sys
+import json
+import time
+import zlib
+import random
+import struct
+import asyncio
+import argparse
+import tempfile
+import subprocess
+from urllib.parse import quote, urlsplit
+
+WORDS = ['alpha', 'beta', 'gamma', 'delta', 'sensor', 'export', 'report', 'sample', 'model', 'run',
+         'batch', 'summary', 'trace', 'metrics', 'raw', 'clean', 'final', 'draft', 'archive', 'daily']
+EXTENSIONS = ['txt', 'csv', 'json', 'log', 'png', 'bin']
+DEFAULT_MIX = 'browse=45,search=20,preview=20,download=5,image=10'
+SORT_KEYS = ['name', 'size', 'modified', 'kind']
+SEARCH_DEBOUNCE = 0.1  # Matches hx-trigger="keyup changed delay:100ms" on the search box
+READ_CHUNK = 64 * 1024
+
+def png_bytes(width: int, height: int, seed: int) -> bytes:
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+    row = bytes([0]) + bytes((seed + x) % 256 for x in range(width * 3))
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)) +
+            chunk(b'IDAT', zlib.compress(row * height)) + chunk(b'IEND', b''))
+
+def file_body(ext: str, rng: random.Random, seed: int) -> bytes:
+    if ext == 'png':
+        return png_bytes(rng.choice((64, 256, 640)), rng.choice((64, 256, 480)), seed)
+    if ext == 'bin':
+        return rng.randbytes(rng.randint(256 * 1024, 4 * 1024 * 1024))
+    if ext == 'json':
+        return json.dumps([{'id': i, 'name': rng.choice(WORDS), 'value': rng.random()}
+                           for i in range(rng.randint(10, 500))]).encode()
+    if ext == 'csv':
+        return ''.join(f"{i},{rng.choice(WORDS)},{rng.random():.6f}\n" for i in range(rng.randint(10, 2000))).encode()
+    return ''.join(f"{i:06d} {rng.choice(WORDS)} {rng.choice(WORDS)} {rng.random():.4f}\n"
+                   for i in range(rng.randint(10, 2000))).encode()
+
+def build_synthetic_tree(root: str, folders: int, files: int, seed: int = 0) -> dict:
+    # The layout is derived from the seed alone, so an existing tree is reused without rescanning it
+    rng = random.Random(seed)
+    tree = {'folders': [''], 'files': [], 'images': []}
+    for i in range(folders):
+        parent = rng.choice(tree['folders'])
+        if parent.count('/') >= 2:
+            parent = ''
+        tree['folders'].append(f"{parent}/{rng.choice(WORDS)}_{i}".lstrip('/'))
+    for folder in tree['folders']:
+        for j in range(files):
+            ext = EXTENSIONS[j % len(EXTENSIONS)]
+            path = f"{folder}/{rng.choice(WORDS)}_{rng.choice(WORDS)}_{j}.{ext}".lstrip('/')
+            (tree['images'] if ext == 'png' else tree['files']).append(path)
+    marker = os.path.join(root, f".synthetic-{folders}-{files}-{seed}")
+    if not os.path.exists(marker):
+        for folder in tree['folders']:
+            os.makedirs(os.path.join(root, folder), exist_ok=True)
+        for n, path in enumerate(tree['files'] + tree['images']):
+            with open(os.path.join(root, path), 'wb') as f:
+                f.write(file_body(path.rsplit('.', 1)[1], rng, n))
+        open(marker, 'w').close()
+    tree['downloads'] = [path for path in tree['files'] if path.endswith('.bin')]
+    return tree
+
+def parse_mix(text: str) -> dict:
+    mix = {}
+    for item in filter(None, text.split(',')):
+        name, _, weight = item.partition('=')
+        if name not in OPERATIONS:
+            raise SystemExit(f"Unknown operation in --mix: {name}")
+        mix[name] = float(weight or 1)
+    return mix
+
+def process_tree_rss(pid: int) -> int:
+    # Summed over the server and its children: `serve()` runs the app in a reloader's child process
+    total, pending = 0, [pid]
+    while pending:
+        current = pending.pop()
+        try:
+            with open(f"/proc/{current}/status") as f:
+                total += next(int(line.split()[1]) for line in f if line.startswith('VmRSS:')) * 1024
+            for task in os.listdir(f"/proc/{current}/task"):
+                with open(f"/proc/{current}/task/{task}/children") as f:
+                    pending.extend(int(child) for child in f.read().split())
+        except (OSError, StopIteration):
+            continue
+    return total
+
+async def discard(reader, n: int):
+    # Bodies are counted, not kept, so large downloads do not inflate the client's memory
+    while n > 0:
+        data = await reader.read(min(n, READ_CHUNK))
+        if not data:
+            raise ConnectionError("Connection closed mid-body")
+        n -= len(data)
+
+async def read_response(reader):
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("Connection closed")
+    status = int(status_line.split()[1])
+    headers = {}
+    while (line := await reader.readline()) not in (b'\r\n', b'\n', b''):
+        key, _, value = line.decode('latin-1').partition(':')
+        headers.setdefault(key.strip().lower(), []).append(value.strip())
+    size = 0
+    if 'content-length' in headers:
+        size = int(headers['content-length'][0])
+        await discard(reader, size)
+    elif 'chunked' in headers.get('transfer-encoding', [''])[0]:
+        while n := int((await reader.readline()).split(b';')[0], 16):
+            await discard(reader, n + 2)
+            size += n
+        while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+            pass
+    elif status not in (204, 304):
+        while data := await reader.read(READ_CHUNK):
+            size += len(data)
+        headers['connection'] = ['close']
+    return status, headers, size
+
+async def request(user: dict, target: str, hx: bool = False):
+    # One keep-alive connection per virtual user, like a browser tab; reconnects once if it went stale
+    for attempt in range(2):
+        reused = user['conn'] is not None
+        if not reused:
+            user['conn'] = await asyncio.open_connection(user['host'], user['port'])
+        reader, writer = user['conn']
+        lines = [f"GET {target} HTTP/1.1", f"Host: {user['host']}:{user['port']}", "Accept-Encoding: gzip, br"]
+        if hx:
+            lines.append("HX-Request: true")
+        if user['cookies']:
+            lines.append("Cookie: " + '; '.join(f"{name}={value}" for name, value in user['cookies'].items()))
+        try:
+            writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode())
+            await writer.drain()
+            status, headers, size = await read_response(reader)
+        except (ConnectionError, asyncio.IncompleteReadError) as e:
+            writer.close()
+            user['conn'] = None
+            if reused and attempt == 0:
+                continue
+            raise e
+        except BaseException:
+            writer.close()
+            user['conn'] = None
+            raise
+        for cookie in headers.get('set-cookie', []):
+            name, _, value = cookie.split(';')[0].partition('=')
+            user['cookies'][name.strip()] = value
+        if headers.get('connection', [''])[0].lower() == 'close':
+            writer.close()
+            user['conn'] = None
+        return status, size
+
+async def timed(stats: dict, user: dict, op: str, target: str, hx: bool = False):
+    start = time.perf_counter()
+    # A stalled server costs a user at most --timeout, and nothing is left waiting past --duration
+    limit = max(0.0, min(user['timeout'], user['deadline'] - start))
+    try:
+        status, size = await asyncio.wait_for(request(user, target, hx), limit)
+        outcome = 'ok' if status < 400 else 'rejected' if status == 503 else 'error'
+    except asyncio.TimeoutError:
+        outcome, size = 'aborted' if time.perf_counter() >= user['deadline'] else 'error', 0
+    except asyncio.CancelledError:
+        stats['records'].append((op, time.perf_counter() - stats['t0'], time.perf_counter() - start, 'aborted', 0))
+        raise
+    except (OSError, ValueError, IndexError, asyncio.IncompleteReadError):
+        outcome, size = 'error', 0
+    stats['records'].append((op, time.perf_counter() - stats['t0'], time.perf_counter() - start, outcome, size))
+
+async def browse(user: dict, stats: dict, rng: random.Random, tree: dict, args):
+    folder = rng.choice(tree['folders'])
+    if rng.random() < 0.3:
+        await timed(stats, user, 'browse', f"/{quote(folder)}")
+    else:
+        # Column sorts and filters are htmx partial reloads of the listing
+        query = f"sort={rng.choice(SORT_KEYS)}&order={rng.choice(('asc', 'desc'))}"
+        await timed(stats, user, 'browse', f"/{quote(folder)}?{query}", hx=True)
+
+async def search(user: dict, stats: dict, rng: random.Random, tree: dict, args):
+    folder = rng.choice(tree['folders'][:5])
+    term = rng.choice(WORDS)[:rng.randint(3, 7)]
+    in_flight = None
+    for typed in range(1, len(term) + 1):
+        gap = rng.uniform(0.04, 0.3) if typed < len(term) else None
+        if gap is not None and gap < SEARCH_DEBOUNCE:
+            await asyncio.sleep(gap)  # The next keystroke lands inside the debounce window
+            continue
+        await asyncio.sleep(SEARCH_DEBOUNCE)
+        if in_flight is not None and not in_flight.done():
+            # hx-sync="this:replace" aborts the older request, which drops its connection
+            in_flight.cancel()
+            await asyncio.gather(in_flight, return_exceptions=True)
+        in_flight = asyncio.create_task(timed(stats, user, 'search', f"/{quote(folder)}?search={quote(term[:typed])}", hx=True))
+        if gap is not None:
+            await asyncio.sleep(gap - SEARCH_DEBOUNCE)
+    await asyncio.gather(in_flight, return_exceptions=True)
+
+async def preview(user: dict, stats: dict, rng: random.Random, tree: dict, args):
+    await timed(stats, user, 'preview', f"/{quote(rng.choice(tree['files'] + tree['images']))}?preview=true", hx=True)
+
+async def download(user: dict, stats: dict, rng: random.Random, tree: dict, args):
+    await timed(stats, user, 'download', f"/{quote(rng.choice(tree['downloads'] or tree['files']))}")
+
+async def image(user: dict, stats: dict, rng: random.Random, tree: dict, args):
+    await timed(stats, user, 'image', f"{args.image_prefix}/{quote(rng.choice(tree['images']))}")
+
+OPERATIONS = {'browse': browse, 'search': search, 'preview': preview, 'download': download, 'image': image}
+
+async def virtual_user(n: int, args, mix: dict, tree: dict, stats: dict, deadline: float):
+    rng = random.Random(args.seed * 100_003 + n)
+    user = {'host': args.host, 'port': args.port, 'conn': None, 'cookies': {}, 'timeout': args.timeout, 'deadline': deadline}
+    await asyncio.sleep(args.ramp * n / args.users)
+    names, weights = list(mix), list(mix.values())
+    while time.perf_counter() < deadline:
+        await OPERATIONS[rng.choices(names, weights)[0]](user, stats, rng, tree, args)
+        if args.think:
+            await asyncio.sleep(min(rng.expovariate(1 / args.think), max(0.0, deadline - time.perf_counter())))
+    if user['conn'] is not None:
+        user['conn'][1].close()
+
+def percentile(values: list, q: float) -> float:
+    return values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+
+def summarize(records: list, seconds: float) -> dict:
+    latencies = sorted(record[2] for record in records if record[3] in ('ok', 'error', 'rejected'))
+    count = lambda outcome: sum(1 for record in records if record[3] == outcome)
+    return {'requests': len(records), 'throughput': len(records) / seconds if seconds else 0.0,
+            'p50_ms': 1000 * percentile(latencies, 0.5), 'p90_ms': 1000 * percentile(latencies, 0.9),
+            'p99_ms': 1000 * percentile(latencies, 0.99), 'max_ms': 1000 * (latencies[-1] if latencies else 0.0),
+            'errors': count('error'), 'rejected': count('rejected'), 'aborted': count('aborted'),
+            'error_rate': count('error') / len(records) if records else 0.0,
+            'mb': sum(record[4] for record in records) / 2**20}
+
+async def report(args, stats: dict, deadline: float):
+    print(f"{'time':>6} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7} {'503s':>6} {'rss MB':>8}")
+    seen = 0
+    while True:
+        await asyncio.sleep(args.interval)
+        now = time.perf_counter() - stats['t0']
+        window = stats['records'][seen:]
+        seen += len(window)
+        rss = process_tree_rss(args.pid) if args.pid else 0
+        point = {'time': now, **summarize(window, args.interval), 'rss_mb': rss / 2**20}
+        stats['timeline'].append(point)
+        print(f"{now:>5.0f}s {point['throughput']:>8.1f} {point['p50_ms']:>8.1f} {point['p99_ms']:>8.1f} "
+              f"{point['errors']:>7} {point['rejected']:>6} {point['rss_mb']:>8.1f}")
+        if time.perf_counter() >= deadline:
+            return
+
+def server_exit(args):
+    # The message to stop with once a server we started has exited, else None
+    if args.server is None or args.server.poll() is None:
+        return None
+    with open(args.server_log, 'rb') as f:
+        f.seek(max(0, os.fstat(f.fileno()).st_size - 4000))
+        output = f.read().decode(errors='replace').strip()
+    return f"fs3.py exited with code {args.server.returncode}" + (f":\n{output}" if output else " and printed nothing")
+
+async def watch_server(args):
+    while (message := server_exit(args)) is None:
+        await asyncio.sleep(0.5)
+    return message
+
+async def wait_for_server(args, timeout: float = 60.0):
+    host, port = args.host, args.port
+    start = time.perf_counter()
+    while True:
+        if (message := server_exit(args)) is not None:
+            raise SystemExit(message)
+        try:
+            _, writer = await asyncio.open_connection(host, port)
+            writer.close()
+            return
+        except OSError:
+            if time.perf_counter() - start > timeout:
+                raise SystemExit(f"Server at {host}:{port} did not come up")
+            await asyncio.sleep(0.25)
+
+async def run(args, mix: dict, tree: dict):
+    await wait_for_server(args)
+    stats = {'records': [], 'timeline': [], 't0': time.perf_counter()}
+    deadline = stats['t0'] + args.duration
+    reporter = asyncio.create_task(report(args, stats, deadline))
+    users = asyncio.gather(*[virtual_user(n, args, mix, tree, stats, deadline) for n in range(args.users)])
+    # A server that dies mid-run would otherwise just show up as a wall of connection errors
+    watcher = asyncio.create_task(watch_server(args))
+    await asyncio.wait([users, watcher], return_when=asyncio.FIRST_COMPLETED)
+    reporter.cancel()
+    if watcher.done():
+        users.cancel()
+        await asyncio.gather(users, return_exceptions=True)
+        raise SystemExit(watcher.result())
+    watcher.cancel()
+    elapsed = time.perf_counter() - stats['t0']
+    operations = {op: summarize([record for record in stats['records'] if record[0] == op], elapsed) for op in mix}
+    overall = summarize(stats['records'], elapsed)
+    print(f"\n{args.users} users for {elapsed:.0f}s, mix {args.mix}")
+    print(f"{'operation':>10} {'requests':>9} {'req/s':>8} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'max ms':>8} "
+          f"{'errors':>7} {'503s':>6} {'aborted':>8} {'MB':>8}")
+    for name, row in [*operations.items(), ('all', overall)]:
+        print(f"{name:>10} {row['requests']:>9} {row['throughput']:>8.1f} {row['p50_ms']:>8.1f} {row['p90_ms']:>8.1f} "
+              f"{row['p99_ms']:>8.1f} {row['max_ms']:>8.1f} {row['errors']:>7} {row['rejected']:>6} "
+              f"{row['aborted']:>8} {row['mb']:>8.1f}")
+    rss = [point['rss_mb'] for point in stats['timeline'] if point['rss_mb']]
+    if rss:
+        print(f"server RSS: {rss[0]:.1f} MB at first sample, {max(rss):.1f} MB peak, {rss[-1]:.1f} MB at the end")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'users': args.users, 'duration': elapsed, 'mix': mix, 'operations': operations,
+                       'overall': overall, 'timeline': stats['timeline']}, f, indent=2)
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay browse, search, preview and download traffic against fs3")
+    parser.add_argument('--url', help="Target an already running server instead of starting fs3.py; needs --tree")
+    parser.add_argument('--pid', type=int, help="Server process to sample RSS from when using --url")
+    parser.add_argument('--tree', help="Folder for the synthetic tree (default: a temporary folder); "
+                                       "with --url, the folder the server was started on")
+    parser.add_argument('--folders', type=int, default=40)
+    parser.add_argument('--files', type=int, default=30, help="Files per folder")
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--duration', type=float, default=30.0, help="Seconds")
+    parser.add_argument('--ramp', type=float, default=5.0, help="Seconds over which users start")
+    parser.add_argument('--think', type=float, default=1.0, help="Mean pause between a user's actions, seconds")
+    parser.add_argument('--mix', default=DEFAULT_MIX, help="Operation weights, e.g. browse=50,search=50")
+    parser.add_argument('--image-prefix', default='', help="Route prefix for image fetches, e.g. /image")
+    parser.add_argument('--timeout', type=float, default=30.0, help="Seconds before a request counts as an error")
+    parser.add_argument('--interval', type=float, default=5.0, help="Seconds between timeline samples")
+    parser.add_argument('--json', help="Write the summary and timeline to this file")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    if args.url and not args.tree:
+        # Requests name paths inside the synthetic tree, so it has to be what the server is serving
+        parser.error("--url needs --tree set to the server's base folder")
+    mix = parse_mix(args.mix)
+    url = urlsplit(args.url or 'http://127.0.0.1:5002')
+    args.host, args.port = url.hostname, url.port or 80
+    with tempfile.TemporaryDirectory() as tmp:
+        root = os.path.abspath(args.tree or os.path.join(tmp, 'tree'))
+        os.makedirs(root, exist_ok=True)
+        tree = build_synthetic_tree(root, args.folders, args.files, args.seed)
+        print(f"Synthetic tree: {len(tree['folders'])} folders, {len(tree['files']) + len(tree['images'])} files in {root}")
+        args.server = None
+        if args.url is None:
+            # The app's own entry point, so the run includes its reloader and middleware as deployed
+            here = os.path.dirname(os.path.abspath(__file__))
+            env = {**os.environ, 'FS3_INDEX_PATH': os.path.join(tmp, 'index.idx'),
+                   'FS3_HASH_CACHE_PATH': os.path.join(tmp, 'checksums.sums')}
+            # Output goes to a file rather than a pipe, which a chatty server could fill and block on
+            args.server_log = os.path.join(tmp, 'server.log')
+            with open(args.server_log, 'wb') as log:
+                args.server = subprocess.Popen([sys.executable, os.path.join(here, 'fs3.py'), root], cwd=here, env=env,
+                                               stdout=log, stderr=subprocess.STDOUT)
+            args.pid = args.server.pid
+        try:
+            asyncio.run(run(args, mix, tree))
+        finally:
+            if args.server is not None and args.server.poll() is None:
+                args.server.terminate()
+                args.server.wait(timeout=30)
+
+if __name__ == '__main__':
+    main()
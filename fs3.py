@@ -5,9 +5,57 @@ import json
 import datetime
 import fnmatch
 import base64
+import gzip
+import hashlib
+import zlib
+import mmap
+import struct
+import array
+import re
+import time
+import shlex
+import asyncio
+import shutil
+import errno
+import threading
+import uuid
+import random
+import hmac
+import functools
+import contextvars
+import sqlite3
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from fasthtml.common import *
 from fastapi import Request
 from typing import List, Tuple
+from urllib.parse import urlencode, quote, parse_qs, parse_qsl
+from html import escape as html_escape
+from starlette.datastructures import MutableHeaders
+from starlette.requests import HTTPConnection
+from itsdangerous import TimestampSigner, BadSignature
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = feather = pq = None
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+try:
+    from watchfiles import awatch
+except ImportError:
+    awatch = None
 
 # Set up base directory
 if len(sys.argv) > 1:
@@ -16,15 +64,429 @@ else:
     base_dir = os.getcwd()
 print(f"Serving {base_dir}")
 
-app = FastHTML(hdrs=(
-    Link(rel="stylesheet", href="/app.css", type="text/css"),
-    Link(rel='stylesheet', href='https://cdnjs.cloudflare.com/ajax/libs/font-awesome/5.15.3/css/all.min.css')
+ASSET_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'public')
+ASSET_COMPRESSIBLE = ('.css', '.js', '.svg', '.json', '.map', '.txt')
+ASSET_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+HTML_COMPRESS_MIN_SIZE = 4096  # Smaller HTML responses are not worth the gzip framing
+# Operation class -> (requests running at once, requests allowed to queue, seconds a request may wait)
+ADMISSION_CLASSES = {
+    'listing': (16, 64, 10.0),
+    'search': (2, 16, 15.0),
+    'preview': (4, 32, 10.0),
+    'download': (8, 32, 30.0),
+}
+ADMISSION_EXEMPT = ('/assets/', '/_upload/', '/_jobs', '/_tail/', '/_live/', '/_dupes', '/_admission', '/_profiles')
+# Path prefix -> operation class, for routes whose class does not depend on the file they name
+ADMISSION_PREFIXES = (('/_hex/', 'preview'), ('/_columnar/', 'preview'), ('/_hash/', 'preview'))
+ADMISSION_RETRY_AFTER = 5
+# Profiling is off unless a token (for X-FS3-Profile / ?_profile= and the /_profiles page) or a sample rate is set
+PROFILE_TOKEN = os.environ.get('FS3_PROFILE_TOKEN', '')
+PROFILE_RATE = float(os.environ.get('FS3_PROFILE_RATE') or 0)
+PROFILE_INTERVAL = 0.002  # Seconds between stack samples while a profiled request runs
+PROFILE_DIR = os.environ.get('FS3_PROFILE_DIR') or os.path.join(
+    os.path.expanduser('~'), '.cache', 'fs3', 'profiles', hashlib.sha1(base_dir.encode()).hexdigest()[:16])
+PROFILE_KEEP = 200
+PROFILE_MAX_SECONDS = 30.0  # Sampling stops after this long; the saved profile is marked truncated
+# Event streams stay open for as long as a page does, so they are never sampled
+PROFILE_EXEMPT = ('/_profiles', '/assets/', '/_live/', '/_tail/', '/_jobs/')
+PROFILE_MIN_SHARE = 0.005  # Flame graph frames below this share of samples are left out
+
+# Source path (relative to ASSET_ROOT) -> fingerprinted URL, and fingerprinted name -> encoded bodies
+assets = {}
+asset_files = {}
+
+def rewrite_css_urls(css: str, css_path: str) -> str:
+    # Point url(...) references at the fingerprinted copies so fonts are cached immutably too
+    def replace(match):
+        target = match.group(2)
+        clean = re.split(r'[?#]', target, 1)[0]
+        source = os.path.normpath(os.path.join(os.path.dirname(css_path), clean)).replace(os.sep, '/')
+        if source not in assets:
+            return match.group(0)
+        return f"url({assets[source]}{target[len(clean):]})"
+    return re.sub(r'url\((["\']?)([^)"\']+)\1\)', replace, css)
+
+def build_assets():
+    sources = []
+    for root, _, filenames in os.walk(ASSET_ROOT):
+        for filename in filenames:
+            sources.append(os.path.relpath(os.path.join(root, filename), ASSET_ROOT).replace(os.sep, '/'))
+    # Stylesheets last, so the files they reference already have fingerprinted URLs
+    for source in sorted(sources, key=lambda name: (name.endswith('.css'), name)):
+        with open(os.path.join(ASSET_ROOT, source), 'rb') as f:
+            body = f.read()
+        if source.endswith('.css'):
+            body = rewrite_css_urls(body.decode('utf-8'), source).encode('utf-8')
+        digest = hashlib.sha256(body).hexdigest()[:12]
+        base, ext = os.path.splitext(source)
+        name = f"{base}.{digest}{ext}"
+        encoded = {'identity': body}
+        if ext in ASSET_COMPRESSIBLE:
+            encoded['gzip'] = gzip.compress(body, compresslevel=9, mtime=0)
+            if brotli is not None:
+                encoded['br'] = brotli.compress(body, quality=11)
+        asset_files[name] = {'encoded': encoded, 'etag': f'"{digest}"',
+                             'media_type': mimetypes.guess_type(source)[0] or 'application/octet-stream'}
+        assets[source] = f"/assets/{name}"
+
+def asset_url(source: str) -> str:
+    return assets.get(source, f"/{source}")
+
+def compress_html(app):
+    # gzip text/html responses above HTML_COMPRESS_MIN_SIZE. Streamed bodies are sync-flushed per
+    # chunk so the browser can render each part as it arrives; everything else passes through.
+    async def middleware(scope, receive, send):
+        if scope['type'] != 'http' or 'gzip' not in Headers(scope=scope).get('accept-encoding', ''):
+            return await app(scope, receive, send)
+        state = {'start': None, 'compressor': None}
+
+        async def send_compressed(message):
+            if message['type'] == 'http.response.start':
+                headers = Headers(raw=message['headers'])
+                # Only whole pages and fragments; a user's .html file sent as a download or a range
+                # must keep its byte counts, so resumed downloads still line up
+                if message['status'] == 200 and headers.get('content-type', '').startswith('text/html') and \
+                        not any(key in headers for key in ('content-encoding', 'content-range', 'content-disposition')):
+                    state['start'] = message
+                    return
+                return await send(message)
+            if message['type'] != 'http.response.body' or state['start'] is None:
+                return await send(message)
+            body, more_body = message.get('body', b''), message.get('more_body', False)
+            if state['compressor'] is None:
+                start = state['start']
+                if not more_body and len(body) < HTML_COMPRESS_MIN_SIZE:
+                    state['start'] = None
+                    await send(start)
+                    return await send(message)
+                state['compressor'] = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+                headers = MutableHeaders(raw=start['headers'])
+                headers['content-encoding'] = 'gzip'
+                headers.add_vary_header('Accept-Encoding')
+                if 'content-length' in headers:
+                    del headers['content-length']
+                await send(start)
+            compressor = state['compressor']
+            data = compressor.compress(body) + compressor.flush(zlib.Z_SYNC_FLUSH if more_body else zlib.Z_FINISH)
+            await send({'type': 'http.response.body', 'body': data, 'more_body': more_body})
+
+        await app(scope, receive, send_compressed)
+    return middleware
+
+def parse_admission_config(text: str) -> dict:
+    # FS3_ADMISSION="search=4:32:20,preview=8" overrides limit[:queue[:timeout]] per class
+    classes = dict(ADMISSION_CLASSES)
+    for item in filter(None, (part.strip() for part in text.split(','))):
+        name, _, values = item.partition('=')
+        if name not in classes:
+            raise ValueError(f"Unknown admission class: {name}")
+        defaults = classes[name]
+        parts = values.split(':')
+        classes[name] = tuple(type(default)(part) if part else default
+                              for default, part in zip(defaults, parts + [''] * (len(defaults) - len(parts))))
+    return classes
+
+admission = {name: {'limit': limit, 'queue_size': queue_size, 'timeout': timeout, 'active': 0, 'queued': 0,
+                    'waiting': OrderedDict(), 'admitted': 0, 'rejected': 0, 'timed_out': 0}
+             for name, (limit, queue_size, timeout) in parse_admission_config(os.environ.get('FS3_ADMISSION', '')).items()}
+
+async def admission_class(scope) -> str:
+    path = scope['path']
+    if path.startswith(ADMISSION_EXEMPT):
+        return None
+    for prefix, name in ADMISSION_PREFIXES:
+        if path.startswith(prefix):
+            return name
+    query = parse_qs(scope['query_string'].decode('latin-1'))
+    if query.get('search', [''])[0]:
+        return 'search'
+    if query.get('preview', [''])[0].lower() in ('1', 'true', 'on', 'yes'):
+        return 'preview'
+    full_path = resolve_path(path.lstrip('/'))
+    if full_path is None or full_path in dir_cache:
+        return 'listing'
+    # Telling a download from a listing needs a stat, which must not hold up the event loop
+    return 'download' if await asyncio.to_thread(os.path.isfile, full_path) else 'listing'
+
+def release_slot(name: str):
+    state = admission[name]
+    if state['waiting']:
+        # Round-robin across clients: hand the slot to the oldest waiter of the next client in line
+        client, tickets = next(iter(state['waiting'].items()))
+        ticket = tickets.popleft()
+        state['queued'] -= 1
+        if tickets:
+            state['waiting'].move_to_end(client)
+        else:
+            del state['waiting'][client]
+        ticket.set_result(True)
+    else:
+        state['active'] -= 1
+
+async def acquire_slot(name: str, client: str) -> bool:
+    state = admission[name]
+    if state['active'] < state['limit'] and not state['queued']:
+        state['active'] += 1
+        state['admitted'] += 1
+        return True
+    if state['queued'] >= state['queue_size']:
+        state['rejected'] += 1
+        return False
+    ticket = asyncio.get_running_loop().create_future()
+    state['waiting'].setdefault(client, deque()).append(ticket)
+    state['queued'] += 1
+    try:
+        await asyncio.wait_for(asyncio.shield(ticket), state['timeout'])
+    except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+        if ticket.done():
+            release_slot(name)  # Granted just as we gave up; pass it on
+        else:
+            ticket.cancel()
+            tickets = state['waiting'][client]
+            tickets.remove(ticket)
+            if not tickets:
+                del state['waiting'][client]
+            state['queued'] -= 1
+        if isinstance(e, asyncio.CancelledError):
+            raise
+        state['timed_out'] += 1
+        return False
+    state['admitted'] += 1
+    return True
+
+def session_search_client(scope):
+    # The session middleware runs inside this one, so read the signed cookie the same way it does
+    cookie = HTTPConnection(scope).cookies.get(app.session_cookie)
+    if not cookie:
+        return None
+    try:
+        session = json.loads(base64.b64decode(TimestampSigner(str(app.secret_key)).unsign(cookie.encode())))
+    except (BadSignature, ValueError):
+        return None
+    return session.get('search_client') if isinstance(session, dict) else None
+
+def admission_control(app):
+    # Runs ahead of the routes so queued requests wait on the event loop rather than holding a
+    # worker thread, and a download keeps its slot until the last byte has been sent.
+    async def middleware(scope, receive, send):
+        name = await admission_class(scope) if scope['type'] == 'http' else None
+        if name is None:
+            return await app(scope, receive, send)
+        client = scope['client'][0] if scope.get('client') else ''
+        if name == 'search':
+            # Stop this client's previous walk now, not once this request is through the queue
+            cancel_client_search(session_search_client(scope))
+        if not await acquire_slot(name, client):
+            response = Response("Server busy, please retry shortly", status_code=503,
+                                headers={'Retry-After': str(ADMISSION_RETRY_AFTER)})
+            return await response(scope, receive, send)
+        try:
+            await app(scope, receive, send)
+        finally:
+            release_slot(name)
+    return middleware
+
+active_profile = contextvars.ContextVar('active_profile', default=None)
+profile_state = {'active': {}, 'sampler': None}
+profile_lock = threading.Lock()
+
+def profile_wanted(scope) -> bool:
+    if PROFILE_TOKEN:
+        supplied = (Headers(scope=scope).get('x-fs3-profile') or
+                    parse_qs(scope['query_string'].decode('latin-1')).get('_profile', [''])[0])
+        if supplied and hmac.compare_digest(supplied, PROFILE_TOKEN):
+            return True
+    return PROFILE_RATE > 0 and random.random() < PROFILE_RATE
+
+def sample_stacks():
+    # Runs only while at least one profiled request is in flight
+    try:
+        while True:
+            with profile_lock:
+                profiles = list(profile_state['active'].values())
+                if not profiles:
+                    profile_state['sampler'] = None
+                    return
+            now = time.perf_counter()
+            for profile in profiles:
+                if now - profile['started'] > PROFILE_MAX_SECONDS:
+                    profile['truncated'] = True
+                    with profile_lock:
+                        profile_state['active'].pop(profile['id'], None)
+            profiles = [profile for profile in profiles if not profile.get('truncated')]
+            frames = sys._current_frames()
+            for profile in profiles:
+                for ident, label in list(profile['threads'].items()):
+                    frame = frames.get(ident)
+                    # An event loop parked in select() is idle, not slow
+                    if frame is None or frame.f_code.co_filename.endswith('selectors.py'):
+                        continue
+                    stack = []
+                    while frame is not None:
+                        code = frame.f_code
+                        # co_qualname is new in Python 3.11
+                        name = getattr(code, 'co_qualname', code.co_name)
+                        stack.append(f"{name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                        frame = frame.f_back
+                    stack.append(label)
+                    key = ';'.join(reversed(stack))
+                    profile['stacks'][key] = profile['stacks'].get(key, 0) + 1
+            del frames
+            time.sleep(PROFILE_INTERVAL)
+    finally:
+        # Also on an unexpected error, so the next profiled request starts a fresh sampler
+        with profile_lock:
+            if profile_state['sampler'] is threading.current_thread():
+                profile_state['sampler'] = None
+
+def profile_query(query_string: str) -> str:
+    # The profiling token must not end up in the profile files or on the profiles page
+    return urlencode([(key, value) for key, value in parse_qsl(query_string, keep_blank_values=True) if key != '_profile'])
+
+def start_profile(scope) -> dict:
+    profile = {'id': f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}", 'method': scope['method'],
+               'path': scope['path'], 'query': profile_query(scope['query_string'].decode('latin-1')), 'status': None,
+               'started': time.perf_counter(), 'time': time.time(), 'stacks': {},
+               'threads': {threading.get_ident(): 'event loop'}}
+    with profile_lock:
+        profile_state['active'][profile['id']] = profile
+        if profile_state['sampler'] is None:
+            profile_state['sampler'] = threading.Thread(target=sample_stacks, name='fs3-profiler', daemon=True)
+            profile_state['sampler'].start()
+    return profile
+
+def finish_profile(profile: dict):
+    with profile_lock:
+        profile_state['active'].pop(profile['id'], None)
+    stacks = profile.pop('stacks')
+    meta = {key: profile[key] for key in ('id', 'method', 'path', 'query', 'status', 'time')}
+    meta.update(duration=time.perf_counter() - profile['started'], samples=sum(stacks.values()), interval=PROFILE_INTERVAL,
+                truncated=profile.get('truncated', False))
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    # Collapsed stacks, one "frame;frame;frame count" line each, as read by flamegraph.pl and speedscope
+    with open(os.path.join(PROFILE_DIR, f"{profile['id']}.folded"), 'w') as f:
+        f.writelines(f"{stack} {count}\n" for stack, count in sorted(stacks.items()))
+    with open(os.path.join(PROFILE_DIR, f"{profile['id']}.json"), 'w') as f:
+        json.dump(meta, f)
+    for stale in sorted(name for name in os.listdir(PROFILE_DIR) if name.endswith('.json'))[:-PROFILE_KEEP]:
+        for ext in ('.json', '.folded'):
+            try:
+                os.remove(os.path.join(PROFILE_DIR, stale[:-5] + ext))
+            except FileNotFoundError:
+                pass
+
+def profile_requests(app):
+    # Only installed when profiling is configured; the handler thread is registered by @profiled
+    async def middleware(scope, receive, send):
+        if scope['type'] != 'http' or scope['path'].startswith(PROFILE_EXEMPT) or not profile_wanted(scope):
+            return await app(scope, receive, send)
+        profile = start_profile(scope)
+        token = active_profile.set(profile)
+
+        async def send_status(message):
+            if message['type'] == 'http.response.start':
+                profile['status'] = message['status']
+            await send(message)
+
+        try:
+            await app(scope, receive, send_status)
+        finally:
+            active_profile.reset(token)
+            await asyncio.to_thread(finish_profile, profile)
+    return middleware
+
+def profiled(handler):
+    if not (PROFILE_TOKEN or PROFILE_RATE):
+        return handler
+
+    @functools.wraps(handler)
+    def wrapper(*args, **kwargs):
+        profile = active_profile.get()
+        if profile is None:
+            return handler(*args, **kwargs)
+        ident = threading.get_ident()
+        profile['threads'][ident] = 'handler'
+        try:
+            return handler(*args, **kwargs)
+        finally:
+            profile['threads'].pop(ident, None)
+    return wrapper
+
+build_assets()
+
+middleware = [Middleware(admission_control), Middleware(compress_html)]
+if PROFILE_TOKEN or PROFILE_RATE:
+    middleware.insert(1, Middleware(profile_requests))
+
+app = FastHTML(htmx=False, surreal=False, middleware=middleware,
+               on_startup=[lambda: start_index()], on_shutdown=[lambda: stop_index(), lambda: stop_hashing(), lambda: stop_dupe_scans()], hdrs=(
+    Script(src=asset_url('vendor/htmx/htmx.min.js')),
+    Link(rel="stylesheet", href=asset_url('app.css'), type="text/css"),
+    Link(rel='stylesheet', href=asset_url('vendor/fontawesome/css/all.min.css'))
 ))
 rt = app.route
 
-@rt("/app.css")
-def get():
-    return FileResponse('./public/app.css')
+@rt("/assets/{name:path}")
+def get(name: str, accept_encoding: str = '', if_none_match: str = ''):
+    asset = asset_files.get(name)
+    if asset is None:
+        return Response("Asset not found", status_code=404)
+    headers = {'Cache-Control': ASSET_CACHE_CONTROL, 'ETag': asset['etag'], 'Vary': 'Accept-Encoding'}
+    if if_none_match == asset['etag']:
+        return Response(status_code=304, headers=headers)
+    accepted = {token.split(';')[0].strip() for token in accept_encoding.split(',')}
+    encoding = next((enc for enc in ('br', 'gzip') if enc in accepted and enc in asset['encoded']), 'identity')
+    if encoding != 'identity':
+        headers['Content-Encoding'] = encoding
+    return Response(asset['encoded'][encoding], media_type=asset['media_type'], headers=headers)
+
+UPLOAD_WRITE_SIZE = 1024 * 1024  # Bytes buffered before each write to the part file
+UPLOAD_CLIENT_CHUNK = 8 * 1024 * 1024  # Slice size used by the browser for each PUT
+UPLOAD_PART_MAX_AGE = 24 * 3600  # Seconds since its last write before an abandoned part file is removed
+JOB_WORKERS = 4
+JOB_HISTORY = 50  # Finished jobs kept around for late SSE subscribers
+JOB_COPY_BUFFER = 1024 * 1024
+DIR_CACHE_TTL = 300.0  # Age at which a listing whose folder mtime is unchanged is rescanned in the background
+LISTING_PAGE_SIZE = 1000
+SORT_COLUMNS = {'name': 1, 'size': 3, 'modified': 4, 'kind': 5}
+VIEW_CACHE_SIZE = 16  # Filtered orderings kept per directory
+SEARCH_CACHE_SIZE = 64
+SEARCH_CACHE_TTL = 30.0
+SEARCH_SESSION_IDLE = 600.0  # Seconds before a client's last result set is dropped
+QUERY_AGE_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+INDEX_PATH = os.environ.get('FS3_INDEX_PATH') or os.path.join(
+    os.path.expanduser('~'), '.cache', 'fs3', hashlib.sha1(base_dir.encode()).hexdigest()[:16] + '.idx')
+INDEX_MAGIC = b'FS3IDX01'
+ENTRY_FOLDER, ENTRY_SYMLINK = 1, 2
+HEX_PAGE_SIZE = 4096  # 256 lines of 16 bytes
+HEX_SEARCH_LIMIT = 64 * 1024 * 1024  # Bytes scanned per find request
+HEX_SEARCH_WINDOW = 16 * 1024 * 1024
+PARQUET_TYPE, ARROW_TYPE = 'application/vnd.apache.parquet', 'application/vnd.apache.arrow.file'
+COLUMNAR_PREVIEW_ROWS = 50
+COLUMNAR_DEFAULT_COLUMNS = 8
+TAIL_INITIAL_BYTES = 64 * 1024  # Backlog sent when a viewer starts following
+TAIL_READ_SIZE = 1024 * 1024  # Bytes read per wake-up; a busy file is drained over several passes
+TAIL_POLL_INTERVAL = 1.0  # Fallback wake-up when no filesystem event arrives
+TAIL_DEBOUNCE_MS = 100
+TAIL_QUEUE_SIZE = 256  # Events buffered per viewer before it is resynced from its offset
+LIVE_POLL_INTERVAL = 2.0  # Fallback check for folder changes when no filesystem event arrives
+LIVE_COALESCE_MS = 250  # Changes within this window reach viewers as one update
+LIVE_QUEUE_SIZE = 64  # Updates buffered per viewer before it is told to reload the listing
+HASH_WORKERS = 4
+HASH_BUFFER_SIZE = 8 * 1024 * 1024
+IMAGE_HEADER_TYPES = ('PNG', 'JPEG', 'GIF', 'WEBP')  # get_file_type values worth opening for metadata
+IMAGE_META_CACHE_SIZE = 50_000
+IMAGE_SEGMENT_LIMIT = 128 * 1024  # Largest EXIF block read from an image header
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+EXIF_ORIENTATIONS = {1: 'Normal', 2: 'Mirrored', 3: 'Rotated 180\u00b0', 4: 'Flipped vertically',
+                     5: 'Mirrored, rotated 90\u00b0 CCW', 6: 'Rotated 90\u00b0 CW',
+                     7: 'Mirrored, rotated 90\u00b0 CW', 8: 'Rotated 90\u00b0 CCW'}
+DUPE_BLOCK_SIZE = 64 * 1024  # Read from each end of a same-size candidate before hashing it in full
+DUPE_HISTORY = 20
+DUPE_WORKERS = 1  # Scans run one at a time; later ones queue behind it
+DUPE_RESULT_GROUPS = 200
+HASH_CACHE_PATH = os.environ.get('FS3_HASH_CACHE_PATH') or os.path.join(
+    os.path.expanduser('~'), '.cache', 'fs3', hashlib.sha1(base_dir.encode()).hexdigest()[:16] + '.sums')
 
 def guess_type_from_content(file_path):
     mime_type, _ = mimetypes.guess_type(file_path)
@@ -37,6 +499,10 @@ def guess_type_from_content(file_path):
             # Add JSON detection
             if file_path.lower().endswith('.json'):
                 return 'application/json'
+            if file_path.lower().endswith(('.parquet', '.pq')):
+                return PARQUET_TYPE
+            if file_path.lower().endswith(('.arrow', '.feather', '.ipc')):
+                return ARROW_TYPE
             
             with open(file_path, 'rb') as f:
                 file_head = f.read(256)  # Read first 256 bytes
@@ -56,6 +522,10 @@ def guess_type_from_content(file_path):
                 mime_type = 'application/pdf'
             elif file_head.startswith(b'PK\x03\x04'):
                 mime_type = 'application/zip'
+            elif file_head.startswith(b'PAR1'):
+                mime_type = PARQUET_TYPE
+            elif file_head.startswith(b'ARROW1'):
+                mime_type = ARROW_TYPE
             # Add more file signatures as needed
             
             # If still unknown, use a generic binary type
@@ -67,17 +537,25 @@ def guess_type_from_content(file_path):
     
     return mime_type
 
+def get_file_type(file_path: str) -> str:
+    mime_type, _ = mimetypes.guess_type(file_path)
+    return mime_type.split('/')[-1].upper() if mime_type else os.path.splitext(file_path)[1][1:].upper() or "Unknown"
+
 def get_file_info(file_path: str) -> Tuple[int, datetime.datetime, str]:
     try:
         stats = os.stat(file_path)
         size = stats.st_size
         creation_time = datetime.datetime.fromtimestamp(stats.st_mtime)
-        mime_type, _ = mimetypes.guess_type(file_path)
-        file_type = mime_type.split('/')[-1].upper() if mime_type else os.path.splitext(file_path)[1][1:].upper() or "Unknown"
-        return size, creation_time, file_type
+        return size, creation_time, get_file_type(file_path)
     except OSError:
         return 0, datetime.datetime.now(), "Unknown"
 
+def get_entry_info(item: tuple) -> Tuple[int, datetime.datetime, str]:
+    # Listing entries carry (size, mtime, type) gathered by scan_directory; search results do not
+    if len(item) > 3:
+        return item[3], datetime.datetime.fromtimestamp(item[4]), item[5]
+    return get_file_info(item[2])
+
 def format_date(date: datetime.datetime) -> str:
     now = datetime.datetime.now()
     if date.date() == now.date():
@@ -93,22 +571,375 @@ def format_size(size: int) -> str:
             return f"{size:.1f} {unit}"
         size /= 1024.0
 
-def search_files(base_path: str, search_term: str) -> List[Tuple[str, str, str]]:
+def parse_size(text: str):
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([KMGT]?)B?\s*', text or '', re.IGNORECASE)
+    if not match:
+        return None
+    number, unit = match.groups()
+    return int(float(number) * 1024 ** ' KMGT'.index(unit.upper() or ' '))
+
+def parse_date(text: str):
+    try:
+        return datetime.datetime.strptime(text, '%Y-%m-%d').timestamp()
+    except (TypeError, ValueError):
+        return None
+
+def compile_text_matcher(pattern: str, regex: bool = False):
+    if regex:
+        return re.compile(pattern).search
+    if any(ch in pattern for ch in '*?['):
+        return re.compile(fnmatch.translate(pattern)).match
+    return re.compile(fnmatch.translate(f'*{pattern}*')).match
+
+def compile_comparison(text: str, parse_value):
+    match = re.fullmatch(r'(<=|>=|<|>|=)?(.+)', text)
+    op, value = match.group(1) or '=', parse_value(match.group(2))
+    if value is None:
+        raise ValueError(f"Invalid value: {text}")
+    return {
+        '<': lambda x: x < value, '<=': lambda x: x <= value, '>': lambda x: x > value,
+        '>=': lambda x: x >= value, '=': lambda x: x == value,
+    }[op]
+
+def compile_modified(text: str):
+    match = re.fullmatch(r'(<=|>=|<|>|=)?(\d+(?:\.\d+)?)([smhdw])', text)
+    if match:
+        # Ages read naturally: modified:<7d is "less than a week old"
+        op, amount, unit = match.groups()
+        age = compile_comparison(f"{op or '='}{float(amount) * QUERY_AGE_UNITS[unit]}", float)
+        return lambda mtime: age(time.time() - mtime)
+    return compile_comparison(text, parse_date)
+
+def query_tokens(query: str) -> List[str]:
+    lexer = shlex.shlex(query, posix=True)
+    lexer.whitespace_split, lexer.escape = True, ''  # Keep backslashes for re: patterns
+    try:
+        return list(lexer)
+    except ValueError:
+        return query.split()  # An unclosed quote while the user is still typing
+
+def compile_query(query: str) -> dict:
+    # Plain terms, globs and re: patterns match the name; terms containing "/" (or path:) match the path
+    # below the search root. Key:value predicates narrow by type, kind, size and modification time.
+    cheap, stat = [], []
+    for token in query_tokens(query):
+        key, _, value = token.partition(':')
+        key = key.lower()
+        if not value or key not in ('re', 'path', 'type', 'kind', 'size', 'modified'):
+            matcher = compile_text_matcher(token)
+            if '/' in token:
+                cheap.append(lambda kind, name, path, m=matcher: m(path))
+            else:
+                cheap.append(lambda kind, name, path, m=matcher: m(name))
+        elif key == 're':
+            try:
+                matcher = compile_text_matcher(value, regex=True)
+            except re.error as e:
+                raise ValueError(f"Invalid regex {value!r}: {e}")
+            cheap.append(lambda kind, name, path, m=matcher: m(name))
+        elif key == 'path':
+            matcher = compile_text_matcher(value)
+            cheap.append(lambda kind, name, path, m=matcher: m(path))
+        elif key == 'type':
+            wanted = 'folder' if value.lower() in ('folder', 'dir', 'directory') else 'file'
+            cheap.append(lambda kind, name, path, w=wanted: kind == w)
+        elif key == 'kind':
+            wanted = value.lower().lstrip('.')
+            cheap.append(lambda kind, name, path, w=wanted: kind == 'file' and (
+                get_file_type(name).lower() == w or os.path.splitext(name)[1][1:].lower() == w))
+        elif key == 'size':
+            size_test = compile_comparison(value, parse_size)
+            stat.append(lambda size, mtime, t=size_test: t(size))
+        else:
+            stat.append(lambda size, mtime, t=compile_modified(value): t(mtime))
+    return {'cheap': cheap, 'stat': stat}
+
+def query_matches(compiled: dict, kind: str, name: str, path: str, size: int = None, mtime: float = None) -> bool:
+    return all(test(kind, name, path) for test in compiled['cheap']) and \
+        all(test(size, mtime) for test in compiled['stat'])
+
+def search_files(base_path: str, search_term: str, cancelled=None) -> List[tuple]:
+    compiled = compile_query(search_term)
     matches = []
-    for root, dirnames, filenames in os.walk(base_path):
-        for filename in fnmatch.filter(filenames, f'*{search_term}*'):
-            full_path = os.path.join(root, filename)
-            relative_path = os.path.relpath(full_path, base_path)
-            matches.append(('file', filename, relative_path))
-        for dirname in fnmatch.filter(dirnames, f'*{search_term}*'):
-            full_path = os.path.join(root, dirname)
-            relative_path = os.path.relpath(full_path, base_path)
-            matches.append(('folder', dirname, relative_path))
+    pending = [(base_path, '')]
+    while pending:
+        if cancelled and cancelled():
+            return None
+        root, prefix = pending.pop()
+        listing = indexed_listing(root)
+        if listing is not None:
+            # Indexed folder: test the stored metadata instead of statting every entry
+            for entry in listing['entries']:
+                if entry[0] == 'folder' and entry[1] not in listing['links']:
+                    pending.append((os.path.join(root, entry[1]), prefix + entry[1] + '/'))
+                if query_matches(compiled, entry[0], entry[1], prefix + entry[1], entry[3], entry[4]):
+                    matches.append(entry)
+            continue
+        try:
+            with os.scandir(root) as it:
+                entries = list(it)
+        except OSError:
+            continue
+        for entry in entries:
+            if is_upload_part(entry.name):
+                continue
+            try:
+                kind = 'folder' if entry.is_dir() else 'file'
+                if kind == 'folder' and not entry.is_symlink():
+                    pending.append((entry.path, prefix + entry.name + '/'))
+                path = prefix + entry.name
+                if not all(test(kind, entry.name, path) for test in compiled['cheap']):
+                    continue
+                # The single stat per candidate feeds both the size/modified predicates and the result row
+                stats = entry.stat()
+                if not all(test(stats.st_size, stats.st_mtime) for test in compiled['stat']):
+                    continue
+            except OSError:
+                continue
+            matches.append((kind, entry.name, os.path.relpath(entry.path, base_dir),
+                            stats.st_size, stats.st_mtime, get_file_type(entry.name)))
+    return matches
+
+search_sessions = {}
+search_cache = OrderedDict()
+search_lock = threading.Lock()
+
+def cached_search(base_path: str, search_term: str):
+    with search_lock:
+        cached = search_cache.get((base_path, search_term))
+        if cached and time.monotonic() - cached[0] < SEARCH_CACHE_TTL:
+            search_cache.move_to_end((base_path, search_term))
+            return cached[1]
+    return None
+
+def store_search(base_path: str, search_term: str, matches: list):
+    with search_lock:
+        search_cache[(base_path, search_term)] = (time.monotonic(), matches)
+        search_cache.move_to_end((base_path, search_term))
+        while len(search_cache) > SEARCH_CACHE_SIZE:
+            search_cache.popitem(last=False)
+
+def is_plain_term(token: str) -> bool:
+    # A substring of the name only; "/" terms match the path, so earlier name-only matches are no superset
+    return ':' not in token and not any(ch in token for ch in '*?[/')
+
+def refinable(previous: str, search_term: str) -> bool:
+    # Terms are ANDed, so the new query is narrower when every previous term is repeated or, for
+    # plain substrings, extended. Globs and predicates are only trusted when repeated verbatim.
+    if not previous:
+        return False
+    new_tokens = query_tokens(search_term)
+    return all(token in new_tokens or (is_plain_term(token) and any(is_plain_term(new) and token in new for new in new_tokens))
+               for token in query_tokens(previous))
+
+def refine_matches(matches: List[tuple], base_path: str, search_term: str) -> List[tuple]:
+    compiled = compile_query(search_term)
+    return [item for item in matches
+            if query_matches(compiled, item[0], item[1], os.path.relpath(os.path.join(base_dir, item[2]), base_path), item[3], item[4])]
+
+def cancel_client_search(client_id: str):
+    with search_lock:
+        session = search_sessions.get(client_id)
+        if session is not None:
+            session['generation'] += 1
+
+def client_search(client_id: str, base_path: str, search_term: str):
+    with search_lock:
+        now = time.monotonic()
+        for idle_id in [key for key, other in search_sessions.items() if now - other['touched'] > SEARCH_SESSION_IDLE]:
+            del search_sessions[idle_id]
+        session = search_sessions.setdefault(client_id, {'generation': 0, 'base_path': None, 'term': None, 'matches': None})
+        session['touched'] = now
+        session['generation'] += 1
+        generation = session['generation']
+        previous = (session['base_path'], session['term'], session['matches'])
+
+    matches = cached_search(base_path, search_term)
+    if matches is None and previous[0] == base_path and previous[2] is not None and refinable(previous[1], search_term):
+        matches = refine_matches(previous[2], base_path, search_term)
+    if matches is None:
+        # A newer keystroke from the same client bumps the generation and stops this walk
+        matches = search_files(base_path, search_term, cancelled=lambda: session['generation'] != generation)
+        if matches is None:
+            return None
+    store_search(base_path, search_term, matches)
+
+    with search_lock:
+        if session['generation'] != generation:
+            return None
+        session.update(base_path=base_path, term=search_term, matches=matches)
     return matches
 
 def get_file_icon(item_type: str) -> str:
     return 'fa-folder' if item_type == 'folder' else 'fa-file'
 
+def parse_exif(tiff: bytes) -> dict:
+    # Orientation from IFD0 and capture time from the Exif sub-IFD (falling back to IFD0's DateTime)
+    if tiff[:2] not in (b'II', b'MM'):
+        return {}
+    order = '<' if tiff[:2] == b'II' else '>'
+
+    def read_ifd(offset: int) -> dict:
+        (count,) = struct.unpack_from(order + 'H', tiff, offset)
+        return {tag: (kind, n, raw) for tag, kind, n, raw in
+                (struct.unpack_from(order + 'HHI4s', tiff, offset + 2 + 12 * i) for i in range(count))}
+
+    def value(entry: tuple):
+        kind, n, raw = entry
+        if kind == 3:
+            return struct.unpack_from(order + 'H', raw)[0]
+        if kind == 4:
+            return struct.unpack_from(order + 'I', raw)[0]
+        if kind == 2:
+            data = raw[:n] if n <= 4 else tiff[struct.unpack(order + 'I', raw)[0]:][:n]
+            return data.rstrip(b'\0').decode('ascii', 'replace')
+        return None
+
+    info = {}
+    try:
+        ifd0 = read_ifd(struct.unpack_from(order + 'I', tiff, 4)[0])
+        orientation = value(ifd0[0x0112]) if 0x0112 in ifd0 else None
+        if isinstance(orientation, int) and 1 <= orientation <= 8:
+            info['orientation'] = orientation
+        taken = ifd0.get(0x0132)
+        if 0x8769 in ifd0:
+            taken = read_ifd(value(ifd0[0x8769])).get(0x9003, taken)
+        if taken:
+            info['taken'] = datetime.datetime.strptime(value(taken), '%Y:%m:%d %H:%M:%S')
+    except (struct.error, ValueError, TypeError):
+        pass
+    return info
+
+def read_png_header(f) -> dict:
+    width, height = struct.unpack('>II', f.read(24)[16:24])
+    info = {'width': width, 'height': height}
+    position = 8
+    while True:
+        # eXIf has to come before the image data, so the walk stops at the first IDAT
+        f.seek(position)
+        header = f.read(8)
+        if len(header) < 8:
+            return info
+        length, chunk_type = struct.unpack('>I4s', header)
+        if chunk_type in (b'IDAT', b'IEND'):
+            return info
+        if chunk_type == b'eXIf' and length <= IMAGE_SEGMENT_LIMIT:
+            info.update(parse_exif(f.read(length)))
+        position += 12 + length
+
+def read_jpeg_header(f) -> dict:
+    info = {}
+    position = 2
+    while True:
+        f.seek(position)
+        marker = f.read(4)
+        if len(marker) < 4 or marker[0] != 0xFF:
+            return info
+        code = marker[1]
+        if code == 0xFF:
+            position += 1  # Fill byte
+            continue
+        if code == 0x01 or 0xD0 <= code <= 0xD8:
+            position += 2  # Markers without a length
+            continue
+        if code in (0xD9, 0xDA):
+            return info  # Entropy-coded data follows; no frame header found before it
+        (length,) = struct.unpack('>H', marker[2:])
+        if code == 0xE1 and length <= IMAGE_SEGMENT_LIMIT:
+            segment = f.read(length - 2)
+            if segment.startswith(b'Exif\0\0'):
+                info.update(parse_exif(segment[6:]))
+        elif code in JPEG_SOF_MARKERS:
+            info['height'], info['width'] = struct.unpack('>HH', f.read(5)[1:5])
+            return info
+        position += 2 + length
+
+def read_webp_header(f) -> dict:
+    head = f.read(30)
+    chunk_type = head[12:16]
+    info = {}
+    if chunk_type == b'VP8 ':
+        width, height = struct.unpack('<HH', head[26:30])
+        info['width'], info['height'] = width & 0x3FFF, height & 0x3FFF
+    elif chunk_type == b'VP8L':
+        bits = int.from_bytes(head[21:25], 'little')
+        info['width'], info['height'] = (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    elif chunk_type == b'VP8X':
+        info['width'] = int.from_bytes(head[24:27], 'little') + 1
+        info['height'] = int.from_bytes(head[27:30], 'little') + 1
+        if head[20] & 0x08:
+            # The EXIF chunk usually follows the image data; hop over chunk headers to reach it
+            position = 12
+            while True:
+                f.seek(position)
+                header = f.read(8)
+                if len(header) < 8:
+                    break
+                chunk_type, length = header[:4], int.from_bytes(header[4:], 'little')
+                if chunk_type == b'EXIF':
+                    if length <= IMAGE_SEGMENT_LIMIT:
+                        data = f.read(length)
+                        info.update(parse_exif(data[6:] if data.startswith(b'Exif\0\0') else data))
+                    break
+                position += 8 + length + (length & 1)
+    return info
+
+def read_image_header(file_path: str) -> dict:
+    try:
+        with open(file_path, 'rb') as f:
+            magic = f.read(16)
+            f.seek(0)
+            if magic.startswith(b'\x89PNG\r\n\x1a\n'):
+                return {'format': 'PNG', **read_png_header(f)}
+            if magic.startswith(b'\xFF\xD8'):
+                return {'format': 'JPEG', **read_jpeg_header(f)}
+            if magic[:6] in (b'GIF87a', b'GIF89a'):
+                width, height = struct.unpack('<HH', magic[6:10])
+                return {'format': 'GIF', 'width': width, 'height': height}
+            if magic[:4] == b'RIFF' and magic[8:12] == b'WEBP':
+                return {'format': 'WEBP', **read_webp_header(f)}
+    except (OSError, struct.error, ValueError, TypeError, IndexError):
+        pass  # A malformed header costs this one file its details, not the whole listing
+    return None
+
+image_meta_cache = OrderedDict()
+image_meta_lock = threading.Lock()
+
+def image_metadata(file_path: str) -> dict:
+    try:
+        st = os.stat(file_path)
+    except OSError:
+        return None
+    key = (st.st_ino, st.st_mtime_ns)
+    with image_meta_lock:
+        if key in image_meta_cache:
+            image_meta_cache.move_to_end(key)
+            return image_meta_cache[key]
+    info = read_image_header(file_path)
+    with image_meta_lock:
+        image_meta_cache[key] = info
+        if len(image_meta_cache) > IMAGE_META_CACHE_SIZE:
+            image_meta_cache.popitem(last=False)
+    return info
+
+def format_image_cells(info: dict) -> Tuple[str, str]:
+    if not info or 'width' not in info:
+        return '', ''
+    width, height = info['width'], info['height']
+    if info.get('orientation', 1) >= 5:
+        width, height = height, width  # Shown as the viewer will display it
+    return f"{width} \u00d7 {height}", format_date(info['taken']) if 'taken' in info else ''
+
+def render_image_metadata(info: dict):
+    if not info or 'width' not in info:
+        return None
+    dimensions, taken = format_image_cells(info)
+    rows = [("Format", info['format']), ("Dimensions", dimensions),
+            ("Orientation", EXIF_ORIENTATIONS.get(info.get('orientation'))), ("Taken", taken)]
+    return Div(cls="mt-2 text-xs text-gray-600")(
+        *[Div(Span(f"{label} ", cls="font-medium"), Span(value)) for label, value in rows if value]
+    )
+
 def get_file_content(file_path):
     mime_type = guess_type_from_content(file_path)
     file_name = os.path.basename(file_path)
@@ -128,6 +959,9 @@ def get_file_content(file_path):
             with open(file_path, 'rb') as file:
                 image_data = base64.b64encode(file.read()).decode('utf-8')
             return file_name, mime_type, f"data:{mime_type};base64,{image_data}"
+        elif mime_type in (PARQUET_TYPE, ARROW_TYPE) and pa is not None:
+            # Columnar files are read lazily by render_columnar_preview
+            return file_name, mime_type, file_path
     
     return file_name, "application/octet-stream", None
 
@@ -137,65 +971,900 @@ def render_preview(file_path: str) -> Div:
     if content is not None:
         if mime_type.startswith('image/'):
             preview_content = Div(cls='image-container')(
-                Img(src=content, cls="max-w-full max-h-[400px] object-contain")
+                Img(src=content, cls="max-w-full max-h-[400px] object-contain"),
+                render_image_metadata(image_metadata(file_path)),
             )
-        elif mime_type == 'application/json' or mime_type.startswith('text/'):
+        elif mime_type == 'application/json':
             preview_content = Pre(content, cls="bg-gray-100 p-4 rounded-md overflow-auto")
+        elif mime_type.startswith('text/'):
+            preview_content = Div(
+                render_follow_toggle(file_path),
+                Pre(content, cls="bg-gray-100 p-4 rounded-md overflow-auto max-h-[70vh]"),
+            )
+        elif mime_type in (PARQUET_TYPE, ARROW_TYPE):
+            try:
+                return render_columnar_preview(content, mime_type)(render_file_checksums(file_path))
+            except (pa.ArrowException, OSError):
+                # Named like a columnar file but not readable as one; show its bytes instead
+                return render_hex_preview(file_path)(render_file_checksums(file_path))
         else:
             preview_content = P(f"Preview not available for this file type: {mime_type}", cls="text-gray-500 italic")
     else:
-        preview_content = P(f"Preview not available for this file type: {mime_type}", cls="text-gray-500 italic")
+        return render_hex_preview(file_path)(render_file_checksums(file_path))
 
     return Div(cls='file-preview w-full h-full')(
         H3(file_name, cls="text-lg font-semibold mb-2"),
-        preview_content
+        preview_content,
+        render_file_checksums(file_path),
+    )
+
+def read_columnar_summary(file_path: str, mime_type: str) -> dict:
+    # Schema, row counts and row-group statistics come from the footer only
+    if mime_type == PARQUET_TYPE:
+        parquet_file = pq.ParquetFile(file_path, memory_map=True)
+        metadata = parquet_file.metadata
+        return {'format': 'Parquet', 'schema': parquet_file.schema_arrow, 'rows': metadata.num_rows,
+                'groups': [metadata.row_group(i).num_rows for i in range(metadata.num_row_groups)],
+                'file': parquet_file, 'metadata': metadata}
+    try:
+        reader = pa.ipc.open_file(pa.memory_map(file_path))
+        return {'format': 'Arrow', 'schema': reader.schema, 'rows': None,
+                'groups': [None] * reader.num_record_batches, 'batch': reader.get_batch, 'metadata': None}
+    except pa.ArrowInvalid:
+        pass
+    # The IPC stream format and Feather V1 have no footer to seek batches by, so the whole file is
+    # opened; both read zero-copy from the memory map
+    with open(file_path, 'rb') as f:
+        magic = f.read(4)
+    if magic == b'FEA1':
+        file_format, table = 'Feather V1', feather.read_table(file_path, memory_map=True)
+    else:
+        file_format, table = 'Arrow stream', pa.ipc.open_stream(pa.memory_map(file_path)).read_all()
+    batches = table.to_batches()
+    return {'format': file_format, 'schema': table.schema, 'rows': table.num_rows,
+            'groups': [batch.num_rows for batch in batches], 'batch': batches.__getitem__, 'metadata': None}
+
+def read_columnar_rows(summary: dict, group: int, columns: List[str], limit: int = COLUMNAR_PREVIEW_ROWS):
+    if summary['format'] == 'Parquet':
+        # Only the selected column chunks of this one row group are read
+        batches = summary['file'].iter_batches(batch_size=limit, row_groups=[group], columns=columns)
+        batch = next(batches, None)
+        return batch.to_pylist() if batch is not None else []
+    # Record batches in an Arrow file are memory-mapped; selecting columns copies nothing
+    batch = summary['batch'](group)
+    return batch.select(columns).slice(0, limit).to_pylist()
+
+def row_group_stats(summary: dict, group: int, columns: List[str]) -> List[tuple]:
+    if summary['metadata'] is None:
+        return []
+    row_group = summary['metadata'].row_group(group)
+    stats = []
+    for i in range(row_group.num_columns):
+        chunk = row_group.column(i)
+        if chunk.path_in_schema not in columns:
+            continue
+        statistics = chunk.statistics
+        has_min_max = statistics is not None and statistics.has_min_max
+        stats.append((chunk.path_in_schema, statistics.min if has_min_max else '-', statistics.max if has_min_max else '-',
+                      statistics.null_count if statistics is not None and statistics.has_null_count else '-',
+                      format_size(chunk.total_compressed_size)))
+    return stats
+
+def format_cell(value) -> str:
+    text = str(value)
+    return text if len(text) <= 80 else text[:77] + '...'
+
+def render_columnar_preview(file_path: str, mime_type: str, columns: List[str] = None, group: int = 0) -> Div:
+    summary = read_columnar_summary(file_path, mime_type)
+    names = summary['schema'].names
+    columns = [name for name in (columns or names[:COLUMNAR_DEFAULT_COLUMNS]) if name in names]
+    group = min(max(group, 0), max(len(summary['groups']) - 1, 0))
+    url = f"/_columnar/{quote(os.path.relpath(file_path, base_dir))}"
+    rows = read_columnar_rows(summary, group, columns) if summary['groups'] and columns else []
+    cell_cls = "px-2 py-1 text-left border-b border-gray-200 whitespace-nowrap"
+    group_query = lambda g: urlencode({'columns': columns, 'group': g}, doseq=True)
+    group_label = 'row groups' if summary['format'] == 'Parquet' else 'record batches'
+    details = [f"{summary['format']}: {len(names)} columns", f"{len(summary['groups'])} {group_label}",
+               f"{summary['rows']:,} rows" if summary['rows'] is not None else None, format_size(os.path.getsize(file_path))]
+    details = [detail for detail in details if detail]
+    return Div(cls='file-preview w-full h-full')(
+        H3(os.path.basename(file_path), cls="text-lg font-semibold mb-2"),
+        P(", ".join(details), cls="text-sm text-gray-600 mb-2"),
+        Form(hx_get=url, hx_target="#preview-area", hx_trigger="change", cls="flex flex-wrap gap-2 mb-2 text-xs text-gray-600")(
+            Input(type="hidden", name="group", value=group),
+            *[Label(cls="flex items-center space-x-1")(
+                Input(type="checkbox", name="columns", value=field.name, checked=field.name in columns),
+                Span(f"{field.name}: {field.type}"))
+              for field in summary['schema']]
+        ),
+        Table(cls="text-xs mb-2")(
+            Thead(Tr(*[Th(label, cls=cell_cls) for label in ("Column", "Min", "Max", "Nulls", "Compressed")])),
+            Tbody(*[Tr(*[Td(format_cell(value), cls=cell_cls) for value in stat]) for stat in row_group_stats(summary, group, columns)])
+        ) if summary['metadata'] is not None and columns else None,
+        Div(cls="overflow-auto")(
+            Table(cls="text-xs")(
+                Thead(Tr(*[Th(name, cls=cell_cls) for name in columns])),
+                Tbody(*[Tr(*[Td(format_cell(row[name]), cls=cell_cls) for name in columns]) for row in rows])
+            )
+        ),
+        render_preview_pager(f"Group {group + 1} of {len(summary['groups'])}, first {len(rows)} rows",
+                             f"{url}?{group_query(group - 1)}" if group > 0 else None,
+                             f"{url}?{group_query(group + 1)}" if group + 1 < len(summary['groups']) else None),
     )
 
-def render_file_list(tree: List[Tuple[str, str, str]], current_path: str) -> Div:
-    return Table(cls="flex flex-col h-full")(
+def map_file_range(f, file_size: int, offset: int, length: int):
+    # mmap offsets must be multiples of the allocation granularity
+    start = offset - offset % mmap.ALLOCATIONGRANULARITY
+    length = min(file_size - start, offset - start + length)
+    return mmap.mmap(f.fileno(), length, offset=start, access=mmap.ACCESS_READ), offset - start
+
+def read_hex_page(file_path: str, offset: int, length: int = HEX_PAGE_SIZE) -> bytes:
+    file_size = os.path.getsize(file_path)
+    if offset >= file_size:
+        return b''
+    with open(file_path, 'rb') as f:
+        mm, skip = map_file_range(f, file_size, offset, length)
+        with mm:
+            return mm[skip:skip + length]
+
+def find_bytes(file_path: str, pattern: bytes, start: int, limit: int = HEX_SEARCH_LIMIT):
+    # Scan at most `limit` bytes from `start`, one mapped window at a time; windows overlap by
+    # len(pattern) - 1 so matches across a boundary are not missed
+    file_size = os.path.getsize(file_path)
+    end = min(file_size, start + limit)
+    with open(file_path, 'rb') as f:
+        position = start
+        while position < end:
+            length = min(HEX_SEARCH_WINDOW, end - position) + len(pattern) - 1
+            mm, skip = map_file_range(f, file_size, position, length)
+            with mm:
+                found = mm.find(pattern, skip, skip + length)
+            if found >= 0:
+                return position + found - skip
+            position += HEX_SEARCH_WINDOW
+    return None
+
+def parse_offset(text: str) -> int:
+    text = (text or '0').strip().lower()
+    return max(0, int(text, 16) if text.startswith('0x') else int(text))
+
+def parse_pattern(text: str) -> bytes:
+    # "0x" starts a hex byte string (spaces allowed); anything else is searched as UTF-8 text
+    if text.lower().startswith('0x'):
+        return bytes.fromhex(text[2:])
+    return text.encode('utf-8')
+
+def format_hex_dump(data: bytes, base_offset: int) -> str:
+    lines = []
+    for i in range(0, len(data), 16):
+        row = data[i:i + 16]
+        hex_part = ' '.join(f"{b:02x}" for b in row[:8]) + '  ' + ' '.join(f"{b:02x}" for b in row[8:])
+        ascii_part = ''.join(chr(b) if 32 <= b <= 126 else '.' for b in row)
+        lines.append(f"{base_offset + i:08x}  {hex_part:<48}  |{ascii_part}|")
+    return '\n'.join(lines)
+
+def render_preview_pager(label: str, prev_url: str = None, next_url: str = None):
+    link_cls = "px-2 text-blue-600 hover:underline cursor-pointer"
+    return Div(cls="flex justify-end items-center p-2 text-xs text-gray-500")(
+        A("Prev", hx_get=prev_url, hx_target="#preview-area", cls=link_cls) if prev_url else None,
+        Span(label),
+        A("Next", hx_get=next_url, hx_target="#preview-area", cls=link_cls) if next_url else None,
+    )
+
+def render_hex_preview(file_path: str, offset: int = 0, find: str = '', start: int = None) -> Div:
+    file_size = os.path.getsize(file_path)
+    url = f"/_hex/{quote(os.path.relpath(file_path, base_dir))}"
+    message = None
+    if find:
+        try:
+            pattern = parse_pattern(find)
+        except ValueError:
+            pattern = b''
+            message = P(f"Invalid hex pattern: {find}", cls="text-red-600 text-sm")
+        if pattern:
+            search_from = offset if start is None else start
+            found = find_bytes(file_path, pattern, search_from)
+            if found is not None:
+                offset = found - found % 16
+                message = P(f"Found at 0x{found:x}. ", cls="text-sm text-gray-600")(
+                    A("Find next", hx_get=f"{url}?{urlencode({'offset': offset, 'find': find, 'start': found + 1})}",
+                      hx_target="#preview-area", cls="text-blue-600 hover:underline cursor-pointer"))
+            elif search_from + HEX_SEARCH_LIMIT < file_size:
+                resume = search_from + HEX_SEARCH_LIMIT
+                message = P(f"Not found in 0x{search_from:x}-0x{resume:x}. ", cls="text-sm text-gray-600")(
+                    A("Keep searching", hx_get=f"{url}?{urlencode({'offset': offset, 'find': find, 'start': resume})}",
+                      hx_target="#preview-area", cls="text-blue-600 hover:underline cursor-pointer"))
+            else:
+                message = P("Not found before the end of the file.", cls="text-sm text-gray-600")
+    offset = min(offset, max(0, file_size - 1))
+    offset -= offset % 16
+    last = min(offset + HEX_PAGE_SIZE, file_size)
+    field_cls = "p-1 border border-gray-300 rounded-md text-sm"
+    return Div(cls='file-preview w-full h-full')(
+        H3(os.path.basename(file_path), cls="text-lg font-semibold mb-2"),
+        Form(hx_get=url, hx_target="#preview-area", cls="flex space-x-2 mb-2")(
+            Input(type="text", name="offset", placeholder="Offset (0x...)", cls=f"{field_cls} w-32"),
+            Input(type="text", name="find", value=find, placeholder="Find text or 0x hex bytes", cls=f"{field_cls} flex-1"),
+            Button("Go", type="submit", cls="px-2 bg-gray-100 rounded hover:bg-gray-200 text-sm"),
+        ),
+        message,
+        Pre(format_hex_dump(read_hex_page(file_path, offset), offset), cls="bg-gray-100 p-4 rounded-md overflow-auto text-xs"),
+        render_preview_pager(f"{format_size(offset)}-{format_size(last)} of {format_size(file_size)}",
+                             f"{url}?offset={max(0, offset - HEX_PAGE_SIZE)}" if offset > 0 else None,
+                             f"{url}?offset={last}" if last < file_size else None),
+    )
+
+tailers = {}
+
+def open_tailer(file_path: str) -> dict:
+    f = open(file_path, 'rb')
+    size = os.fstat(f.fileno()).st_size
+    # Start on a line boundary so the first appended event begins a fresh line
+    window = os.pread(f.fileno(), min(size, TAIL_INITIAL_BYTES), max(0, size - TAIL_INITIAL_BYTES))
+    boundary = window.rfind(b'\n')
+    offset = size - len(window) + boundary + 1 if boundary >= 0 else size
+    return {'path': file_path, 'file': f, 'inode': os.fstat(f.fileno()).st_ino, 'generation': 0,
+            'offset': offset, 'delivered': offset, 'partial': b'', 'subscribers': set(),
+            'wake': asyncio.Event(), 'task': None}
+
+def read_tail_events(tailer: dict) -> Tuple[List[tuple], bool]:
+    # Runs in a worker thread; only the tailer task calls it, so the file state is not shared. Also
+    # returns whether a full read left more waiting; the wake event belongs to the loop, so the
+    # tailer task sets it, not this thread.
+    events = []
+    f = tailer['file']
+    if os.fstat(f.fileno()).st_size < tailer['offset']:
+        # Truncated in place (e.g. `> app.log`): restart from the top
+        tailer['offset'], tailer['partial'] = 0, b''
+        events.append(('reset', b'', tailer['generation'], 0))
+    data = os.pread(f.fileno(), TAIL_READ_SIZE, tailer['offset'])
+    tailer['offset'] += len(data)
+    more = len(data) == TAIL_READ_SIZE
+    if not data:
+        try:
+            rotated = os.stat(tailer['path']).st_ino != tailer['inode']
+        except FileNotFoundError:
+            rotated = False  # Moved away but not yet recreated; keep reading the old file
+        if rotated:
+            # The old file is drained, so flush its unterminated last line and switch to the new one
+            if tailer['partial']:
+                events.append(('append', tailer['partial'], tailer['generation'], tailer['offset']))
+            f.close()
+            tailer['file'] = f = open(tailer['path'], 'rb')
+            tailer['inode'] = os.fstat(f.fileno()).st_ino
+            tailer['generation'] += 1
+            tailer['offset'], tailer['partial'] = 0, b''
+            events.append(('rotate', b'', tailer['generation'], 0))
+            new_events, more = read_tail_events(tailer)
+            return events + new_events, more
+        return events, more
+    data = tailer['partial'] + data
+    boundary = data.rfind(b'\n') + 1
+    tailer['partial'] = data[boundary:]
+    if boundary:
+        events.append(('append', data[:boundary], tailer['generation'], tailer['offset'] - len(tailer['partial'])))
+    return events, more
+
+def broadcast_tail_event(tailer: dict, event: tuple):
+    tailer['delivered'] = event[3]
+    for queue in list(tailer['subscribers']):
+        try:
+            queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # A slow viewer drops its backlog and re-reads from its own offset instead
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait(('resync', b'', tailer['generation'], tailer['delivered']))
+
+async def watch_tail_file(tailer: dict, stop: asyncio.Event):
+    # Watch the folder rather than the file so a rotated-in replacement still wakes us
+    async for _ in awatch(os.path.dirname(tailer['path']), recursive=False, stop_event=stop,
+                          debounce=TAIL_DEBOUNCE_MS, watch_filter=lambda change, path: path == tailer['path']):
+        tailer['wake'].set()
+
+async def run_tailer(tailer: dict):
+    stop = asyncio.Event()
+    watcher = asyncio.create_task(watch_tail_file(tailer, stop)) if awatch is not None else None
+    try:
+        while tailer['subscribers']:
+            try:
+                await asyncio.wait_for(tailer['wake'].wait(), TAIL_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            tailer['wake'].clear()
+            try:
+                events, more = await asyncio.to_thread(read_tail_events, tailer)
+            except OSError:
+                events, more = [], False
+            if more:
+                tailer['wake'].set()  # More is waiting; come straight back for it
+            for event in events:
+                broadcast_tail_event(tailer, event)
+    finally:
+        # Unregistered in the same step that finds no subscribers, so tail_events never picks up a
+        # tailer that is shutting down
+        if tailers.get(tailer['path']) is tailer:
+            del tailers[tailer['path']]
+        stop.set()
+        if watcher is not None:
+            watcher.cancel()
+        tailer['file'].close()
+
+def read_tail_range(tailer: dict, start: int, end: int, align: bool) -> bytes:
+    try:
+        data = os.pread(tailer['file'].fileno(), end - start, start)
+    except (OSError, ValueError):
+        return b''  # The file was swapped out by a rotation; the queued events carry on from there
+    if align and start > 0:
+        data = data[data.find(b'\n') + 1:]
+    return data
+
+def parse_tail_event_id(event_id: str) -> Tuple[int, int]:
+    try:
+        generation, offset = event_id.split(':')
+        return int(generation), int(offset)
+    except ValueError:
+        return -1, -1
+
+def tail_message(event: str, data: bytes, generation: int, offset: int) -> str:
+    lines = data.decode('utf-8', errors='replace').splitlines() or ['']
+    return f"event: {event}\nid: {generation}:{offset}\n" + ''.join(f"data: {line}\n" for line in lines) + "\n"
+
+async def catch_up_tail(tailer: dict, generation: int, offset: int, end: int):
+    if generation == tailer['generation'] and max(0, end - TAIL_INITIAL_BYTES) <= offset <= end:
+        if offset == end:
+            return None
+        data = await asyncio.to_thread(read_tail_range, tailer, offset, end, False)
+        return tail_message('append', data, generation, end)
+    # New viewer, or one too far behind: replace its view with the latest backlog
+    data = await asyncio.to_thread(read_tail_range, tailer, max(0, end - TAIL_INITIAL_BYTES), end, True)
+    return tail_message('reset', data, tailer['generation'], end)
+
+async def tail_events(file_path: str, last_event_id: str = ''):
+    tailer = tailers.get(file_path)
+    if tailer is None:
+        tailer = await asyncio.to_thread(open_tailer, file_path)
+        if file_path in tailers:
+            # Another viewer opened it while we were waiting; share theirs
+            tailer['file'].close()
+            tailer = tailers[file_path]
+        else:
+            tailers[file_path] = tailer
+    queue = asyncio.Queue(TAIL_QUEUE_SIZE)
+    tailer['subscribers'].add(queue)
+    if tailer['task'] is None:
+        tailer['task'] = asyncio.create_task(run_tailer(tailer))
+    generation, offset = parse_tail_event_id(last_event_id)
+    end = tailer['delivered']
+    try:
+        while True:
+            message = await catch_up_tail(tailer, generation, offset, end)
+            generation, offset = tailer['generation'], end
+            if message:
+                yield message
+            while True:
+                event, data, event_generation, end = await queue.get()
+                if event == 'resync':
+                    break
+                generation, offset = event_generation, end
+                yield tail_message(event, data, generation, end)
+    finally:
+        tailer['subscribers'].discard(queue)
+        tailer['wake'].set()  # Lets the tailer notice it has no viewers left
+
+def render_follow_toggle(file_path: str):
+    url = f"/_tail/{quote(os.path.relpath(file_path, base_dir))}"
+    return Label(cls="flex items-center space-x-1 text-sm text-gray-600 mb-2")(
+        Input(type="checkbox", onchange=f"followTail(this, {json.dumps(url)})"),
+        Span("Follow"),
+        Script("""
+            function followTail(toggle, url) {
+                const pre = toggle.closest('.file-preview').querySelector('pre');
+                if (!toggle.checked) { pre.tail?.close(); return; }
+                const events = pre.tail = new EventSource(url);
+                const show = (text, replace) => {
+                    // Stop once the preview has been swapped for another file
+                    if (!pre.isConnected) { events.close(); return; }
+                    const atBottom = pre.scrollTop + pre.clientHeight >= pre.scrollHeight - 4;
+                    pre.textContent = (replace ? '' : pre.textContent) + text;
+                    if (atBottom) pre.scrollTop = pre.scrollHeight;
+                };
+                events.addEventListener('append', e => show(e.data + '\\n'));
+                events.addEventListener('reset', e => show(e.data ? e.data + '\\n' : '', true));
+                events.addEventListener('rotate', () => show('--- file rotated ---\\n'));
+            }
+        """),
+    )
+
+def listing_query(view: dict, **changes) -> str:
+    params = {**view, **changes}
+    return urlencode({key: value for key, value in params.items() if value not in ('', None, False, 0)})
+
+def render_sort_header(label: str, key: str, cls: str, current_path: str, view: dict):
+    if view is None:
+        return Th(label, cls=cls)
+    active = view['sort'] == key
+    order = 'desc' if active and view['order'] == 'asc' else 'asc'
+    arrow = ('' if not active else ' \u25b2' if view['order'] == 'asc' else ' \u25bc')
+    return Th(cls=cls)(
+        A(label + arrow, hx_get=f"/{current_path}?{listing_query(view, sort=key, order=order, page=0)}",
+          hx_target="#file-list-container", cls="cursor-pointer hover:text-gray-700")
+    )
+
+def render_listing_filters(current_path: str, view: dict, kinds: List[str]) -> Form:
+    field_cls = "p-1 border border-gray-300 rounded-md"
+    return Form(hx_get=f"/{current_path}", hx_target="#file-list-container", hx_trigger="change",
+                cls="flex flex-wrap items-center gap-2 p-2 text-xs text-gray-600 border-b border-gray-200")(
+        Input(type="hidden", name="sort", value=view['sort']),
+        Input(type="hidden", name="order", value=view['order']),
+        Select(name="kind", cls=field_cls)(
+            Option("All kinds", value=""),
+            *[Option(kind, value=kind, selected=kind == view['kind']) for kind in ['folder'] + kinds]
+        ),
+        Input(type="text", name="min_size", value=view['min_size'], placeholder="Min size", cls=f"{field_cls} w-20"),
+        Input(type="text", name="max_size", value=view['max_size'], placeholder="Max size", cls=f"{field_cls} w-20"),
+        Input(type="date", name="after", value=view['after'], cls=field_cls),
+        Input(type="date", name="before", value=view['before'], cls=field_cls),
+        Label(cls="flex items-center space-x-1")(
+            Input(type="checkbox", name="folders_first", value="true", checked=view['folders_first']),
+            Span("Folders first")
+        ),
+        Label(cls="flex items-center space-x-1")(
+            Input(type="checkbox", name="image_columns", value="true", checked=view['image_columns']),
+            Span("Image details")
+        ),
+    )
+
+def render_pager(current_path: str, view: dict, total: int):
+    first = view['page'] * LISTING_PAGE_SIZE
+    last = min(first + LISTING_PAGE_SIZE, total)
+    link_cls = "px-2 text-blue-600 hover:underline cursor-pointer"
+    return Div(cls="flex justify-end items-center p-2 text-xs text-gray-500 border-t border-gray-200")(
+        A("Prev", hx_get=f"/{current_path}?{listing_query(view, page=view['page'] - 1)}",
+          hx_target="#file-list-container", cls=link_cls) if view['page'] > 0 else None,
+        Span(f"{first + 1 if total else 0}-{last} of {total}"),
+        A("Next", hx_get=f"/{current_path}?{listing_query(view, page=view['page'] + 1)}",
+          hx_target="#file-list-container", cls=link_cls) if last < total else None,
+    )
+
+def render_file_list(tree: List[tuple], current_path: str, view: dict = None, total: int = None, kinds: List[str] = None) -> Div:
+    image_columns = bool(view and view.get('image_columns'))
+    table = Table(cls="flex flex-col h-full")(
         # Fixed header
         Thead(cls="bg-gray-50 sticky top-0 z-10")(
             Tr(cls="flex text-left text-xs font-medium text-gray-500 uppercase tracking-wider")(
-                Th("Name", cls="w-2/5 p-3"),
-                Th("Size", cls="w-1/6 p-3 text-right"),
-                Th("Kind", cls="w-1/6 p-3 text-center"),
-                Th("Date Added", cls="w-1/4 p-3 text-right"),
+                render_sort_header("Name", 'name', "w-2/5 p-3", current_path, view),
+                render_sort_header("Size", 'size', "w-1/6 p-3 text-right", current_path, view),
+                render_sort_header("Kind", 'kind', "w-1/6 p-3 text-center", current_path, view),
+                render_sort_header("Date Added", 'modified', "w-1/4 p-3 text-right", current_path, view),
+                *([Th("Dimensions", cls="w-1/6 p-3 text-right"), Th("Taken", cls="w-1/6 p-3 text-right")]
+                  if image_columns else []),
             )
         ),
         # Scrollable content
-        Tbody(cls="flex-1 overflow-auto")(
-            *[Tr(cls="flex hover:bg-gray-50")(
-                Td(cls="w-2/5 p-3 flex items-center space-x-2")(
-                    I(cls=f'fas {get_file_icon(item[0])} text-gray-400 flex-shrink-0'),
-                    Div(cls='truncate')(
-                        A(item[1], 
-                        href=f'/{os.path.relpath(item[2], base_dir)}' if item[0] == 'folder' else '#',
-                        hx_get=f'/{os.path.relpath(item[2], base_dir)}?preview=true' if item[0] == 'file' else None,
-                        hx_target='#preview-area',
-                        cls='text-gray-900 hover:text-blue-600')
-                        # A(item[1], 
-                        #     href=f'/{os.path.relpath(item[2], base_dir)}' if item[0] == 'folder' else '#',
-                        #     onclick=f"showPreview('{os.path.relpath(item[2], base_dir)}')" if item[0] == 'file' else None,
-                        #     cls='text-gray-900 hover:text-blue-600')
-                    )
-                ),
-                Td(format_size(get_file_info(item[2])[0]), cls='w-1/6 p-3 text-right text-gray-500 text-sm'),
-                Td(Div(get_file_info(item[2])[2], cls='truncate'), cls='w-1/6 p-3 text-left text-gray-500 text-sm'),
-                Td(Div(format_date(get_file_info(item[2])[1]), cls='truncate'), cls='w-1/4 p-3 text-right text-gray-500 text-sm'),
-            ) for item in tree]
+        Tbody(id="file-rows", cls="flex-1 overflow-auto")(
+            *[render_file_row(item, format_entry_cells(item, image_columns)) for item in tree]
         )
     )
+    if view is None:
+        return table
+    # Directory views (not search results) follow changes through /_live, see render_live_listing_script
+    query = listing_query(view)
+    return Div(cls="flex flex-col h-full", data_path=current_path, data_live=f"/_live/{quote(current_path)}?{query}",
+               data_listing=f"/{quote(current_path)}?{query}")(
+        render_listing_filters(current_path, view, kinds or []),
+        table,
+        render_pager(current_path, view, total) if total > LISTING_PAGE_SIZE else None,
+    )
+
+def format_entry_cells(item: tuple, image_columns: bool = False) -> Tuple[str, ...]:
+    size, date, file_type = get_entry_info(item)
+    cells = format_size(size), file_type, format_date(date)
+    if not image_columns:
+        return cells
+    # Only recognised image types are opened, and only their headers are read
+    info = image_metadata(os.path.join(base_dir, item[2])) if item[0] == 'file' and file_type in IMAGE_HEADER_TYPES else None
+    return cells + format_image_cells(info)
+
+def row_dom_id(path: str) -> str:
+    return 'row-' + hashlib.md5(path.encode()).hexdigest()[:16]
+
+def render_file_row(item: tuple, cells: Tuple[str, ...], row_id: str = None) -> Tr:
+    size, file_type, date = cells[:3]
+    # Entry paths are relative to base_dir (see scan_directory and search_files)
+    return Tr(id=row_id or row_dom_id(item[2]), cls="flex hover:bg-gray-50")(
+        Td(cls="w-2/5 p-3 flex items-center space-x-2")(
+            Input(type='checkbox', name='paths', value=item[2], cls='row-select flex-shrink-0'),
+            I(cls=f'fas {get_file_icon(item[0])} text-gray-400 flex-shrink-0'),
+            Div(cls='truncate')(
+                A(item[1], 
+                href=f'/{item[2]}' if item[0] == 'folder' else '#',
+                hx_get=f'/{item[2]}?preview=true' if item[0] == 'file' else None,
+                hx_target='#preview-area',
+                cls='text-gray-900 hover:text-blue-600')
+                # A(item[1], 
+                #     href=f'/{os.path.relpath(item[2], base_dir)}' if item[0] == 'folder' else '#',
+                #     onclick=f"showPreview('{os.path.relpath(item[2], base_dir)}')" if item[0] == 'file' else None,
+                #     cls='text-gray-900 hover:text-blue-600')
+            )
+        ),
+        Td(size, cls='w-1/6 p-3 text-right text-gray-500 text-sm'),
+        Td(Div(file_type, cls='truncate'), cls='w-1/6 p-3 text-left text-gray-500 text-sm'),
+        Td(Div(date, cls='truncate'), cls='w-1/4 p-3 text-right text-gray-500 text-sm'),
+        *[Td(Div(cell, cls='truncate'), cls='w-1/6 p-3 text-right text-gray-500 text-sm') for cell in cells[3:]],
+    )
+
+# Fast path for large listings: render_file_row is rendered once per (kind, indent) with sentinel
+# values and split into literal markup and slots, so each row only escapes and joins its own values.
+# The output is byte-identical to to_xml(render_file_list(...)).
+ROW_SLOT = re.compile(r'([\w-]+)="([^"]*\x00[^"]*)"|\x00(\w+)\x00')
+ROW_SENTINELS = ('\x00name\x00', '\x00path\x00'), ('\x00size\x00', '\x00type\x00', '\x00date\x00')
+IMAGE_SENTINELS = ('\x00dimensions\x00', '\x00taken\x00')
+row_templates = {}
+
+def html_attr(key: str, value: str) -> str:
+    # Same quoting rules as fastcore's attribute rendering
+    if '&' in value or '<' in value or '>' in value:
+        value = html_escape(value, quote=False)
+    quote = '"'
+    if quote in value:
+        quote = "'"
+        value = value.replace("'", "&#39;")
+    return f'{key}={quote}{value}{quote}'
+
+def compile_row_template(kind: str, lvl: int, image_columns: bool = False) -> list:
+    (name, path), cells = ROW_SENTINELS
+    if image_columns:
+        cells += IMAGE_SENTINELS
+    row_html = to_xml(render_file_row((kind, name, path), cells, '\x00rowid\x00'), lvl=lvl)
+    parts, pos = [], 0
+    for match in ROW_SLOT.finditer(row_html):
+        parts.append(row_html[pos:match.start()])
+        if match.group(1):
+            value_format = match.group(2).replace('{', '{{').replace('}', '}}')
+            parts.append((match.group(1), re.sub(r'\x00(\w+)\x00', r'{\1}', value_format)))
+        else:
+            parts.append(match.group(3))
+        pos = match.end()
+    parts.append(row_html[pos:])
+    return parts
+
+def render_row_html(parts: list, values: dict) -> str:
+    return ''.join(
+        part if i % 2 == 0 else
+        html_attr(part[0], part[1].format(**values)) if isinstance(part, tuple) else
+        html_escape(values[part], quote=False)
+        for i, part in enumerate(parts))
+
+def render_file_list_html(tree: List[tuple], current_path: str, view: dict = None, total: int = None, kinds: List[str] = None) -> str:
+    skeleton = to_xml(render_file_list([], current_path, view, total, kinds))
+    if not tree:
+        return skeleton
+    # An empty tbody renders inline; with rows it opens a line and closes at its own indent
+    tbody_start = skeleton.index('<tbody')
+    indent = skeleton[skeleton.rindex('\n', 0, tbody_start) + 1:tbody_start]
+    tbody_close = skeleton.index('</tbody>', tbody_start)
+    image_columns = bool(view and view.get('image_columns'))
+    rows = []
+    for item in tree:
+        key = (item[0], len(indent) + 2, image_columns)
+        parts = row_templates.get(key)
+        if parts is None:
+            parts = row_templates[key] = compile_row_template(*key)
+        cells = format_entry_cells(item, image_columns)
+        values = {'name': item[1], 'path': item[2], 'rowid': row_dom_id(item[2]),
+                  'size': cells[0], 'type': cells[1], 'date': cells[2]}
+        if image_columns:
+            values['dimensions'], values['taken'] = cells[3:]
+        rows.append(render_row_html(parts, values))
+    return skeleton[:tbody_close] + '\n' + ''.join(rows) + indent + skeleton[tbody_close:]
+
+dir_cache = {}
+
+def expire_upload_part(entry: os.DirEntry):
+    # Scans pass every part file anyway, so abandoned uploads are cleared as their folders are rescanned
+    try:
+        if time.time() - entry.stat(follow_symlinks=False).st_mtime > UPLOAD_PART_MAX_AGE and entry.path not in active_uploads:
+            os.remove(entry.path)
+    except OSError:
+        pass
+
+def scan_directory(path: str) -> Tuple[List[tuple], frozenset]:
+    # One stat per entry; everything sorting and filtering needs is kept in the tuple
+    entries, links = [], set()
+    with os.scandir(path) as it:
+        for entry in it:
+            if is_upload_part(entry.name):
+                expire_upload_part(entry)
+                continue
+            try:
+                stats = entry.stat()
+                kind = 'folder' if entry.is_dir() else 'file'
+                if entry.is_symlink():
+                    links.add(entry.name)
+            except OSError:
+                continue
+            relative_path = os.path.relpath(entry.path, base_dir)
+            entries.append((kind, entry.name, relative_path, stats.st_size, stats.st_mtime, get_file_type(entry.name)))
+    return entries, frozenset(links)
+
+def make_listing(dir_mtime: int, entries: List[tuple], links: frozenset) -> dict:
+    return {
+        'dir_mtime': dir_mtime, 'scanned': time.monotonic(), 'entries': entries, 'links': links, 'orders': {}, 'views': {},
+        'kinds': sorted({entry[5] for entry in entries if entry[0] == 'file'}),
+    }
+
+def refresh_listing(path: str, dir_mtime: int) -> dict:
+    listing = dir_cache[path] = make_listing(dir_mtime, *scan_directory(path))
+    index_state['dirty'] = True
+    return listing
+
+def stat_entry(entry_path: str) -> tuple:
+    stats = os.stat(entry_path)
+    kind = 'folder' if os.path.isdir(entry_path) else 'file'
+    name = os.path.basename(entry_path)
+    return kind, name, os.path.relpath(entry_path, base_dir), stats.st_size, stats.st_mtime, get_file_type(name)
+
+def update_listing_entry(path: str, name: str, dir_mtime: int):
+    # Applies one known change to the cached listing without a rescan. dir_mtime is the folder's mtime
+    # just before the change; if the cache is older than that, something else changed and the next
+    # read rescans as usual.
+    listing = dir_cache.get(path) or snapshot_listing(path)
+    if listing is None or listing['dir_mtime'] != dir_mtime:
+        return None
+    entries = [entry for entry in listing['entries'] if entry[1] != name]
+    entry = None
+    entry_path = os.path.join(path, name)
+    if not is_upload_part(name) and os.path.lexists(entry_path):
+        entry = stat_entry(entry_path)
+        entries.append(entry)
+    dir_cache[path] = make_listing(os.stat(path).st_mtime_ns, entries, listing['links'] - {name})
+    index_state['dirty'] = True
+    return entry
+
+refresh_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='fs3-refresh')
+stale_refreshes = set()
+
+def refresh_stale_listing(path: str):
+    try:
+        refresh_listing(path, os.stat(path).st_mtime_ns)
+    except OSError:
+        pass
+    finally:
+        stale_refreshes.discard(path)
+
+def get_directory_listing(path: str) -> dict:
+    dir_mtime = os.stat(path).st_mtime_ns
+    listing = dir_cache.get(path) or snapshot_listing(path)
+    if listing is None or listing['dir_mtime'] != dir_mtime:
+        listing = refresh_listing(path, dir_mtime)
+    elif time.monotonic() - listing['scanned'] > DIR_CACHE_TTL and path not in stale_refreshes:
+        # Files rewritten in place leave the folder mtime alone; pick up their sizes without making
+        # this request (and its cached sort orders) wait for a rescan
+        stale_refreshes.add(path)
+        refresh_pool.submit(refresh_stale_listing, path)
+    return listing
+
+def indexed_listing(path: str):
+    # Index entries for a folder whose mtime still matches; one stat instead of one per entry
+    listing = dir_cache.get(path) or snapshot_listing(path)
+    try:
+        if listing is not None and listing['dir_mtime'] == os.stat(path).st_mtime_ns:
+            return listing
+    except OSError:
+        pass
+    return None
+
+def sort_order(listing: dict, key: str, descending: bool = False, folders_first: bool = False) -> List[int]:
+    cache_key = (key, descending, folders_first)
+    order = listing['orders'].get(cache_key)
+    if order is None:
+        entries = listing['entries']
+        if descending or folders_first:
+            order = sort_order(listing, key)
+            if descending:
+                order = order[::-1]
+            if folders_first:
+                order = [i for i in order if entries[i][0] == 'folder'] + [i for i in order if entries[i][0] != 'folder']
+        else:
+            column = SORT_COLUMNS[key]
+            order = sorted(range(len(entries)), key=lambda i: entries[i][column])
+        listing['orders'][cache_key] = order
+    return order
+
+def entry_matches(entry: tuple, kind: str, min_size, max_size, after, before) -> bool:
+    if kind and (entry[0] != 'folder' if kind == 'folder' else entry[5] != kind or entry[0] == 'folder'):
+        return False
+    if min_size is not None and entry[3] < min_size:
+        return False
+    if max_size is not None and entry[3] > max_size:
+        return False
+    if after is not None and entry[4] < after:
+        return False
+    # "before" is inclusive of the chosen day
+    if before is not None and entry[4] >= before + 86400:
+        return False
+    return True
+
+def view_order(listing: dict, view: dict) -> List[int]:
+    entries = listing['entries']
+    order = sort_order(listing, view['sort'], view['order'] == 'desc', view['folders_first'])
+    filters = (view['kind'], parse_size(view['min_size']), parse_size(view['max_size']),
+               parse_date(view['after']), parse_date(view['before']))
+    if any(value not in ('', None) for value in filters):
+        view_key = (view['sort'], view['order'], view['folders_first'], filters)
+        filtered = listing['views'].get(view_key)
+        if filtered is None:
+            filtered = [i for i in order if entry_matches(entries[i], *filters)]
+            if len(listing['views']) >= VIEW_CACHE_SIZE:
+                listing['views'].pop(next(iter(listing['views'])))
+            listing['views'][view_key] = filtered
+        order = filtered
+    return order
+
+def list_directory(path: str, view: dict) -> Tuple[List[tuple], int, List[str]]:
+    listing = get_directory_listing(path)
+    order = view_order(listing, view)
+    first = view['page'] * LISTING_PAGE_SIZE
+    return [listing['entries'][i] for i in order[first:first + LISTING_PAGE_SIZE]], len(order), listing['kinds']
 
-def build_tree(path: str) -> List[Tuple[str, str, str]]:
-    tree = []
-    for item in sorted(os.listdir(path)):
-        item_path = os.path.join(path, item)
-        relative_path = os.path.relpath(item_path, base_dir)
-        if os.path.isdir(item_path):
-            tree.append(('folder', item, relative_path))
+# Index snapshot: every indexed folder of base_dir in one flat file of fixed-width arrays that is
+# mmapped at startup. Folders are decoded into dir_cache only when first used, and a background
+# pass re-stats folders and rescans only those whose mtime changed.
+#
+#   magic, u32 header length, JSON header, then 8-byte aligned arrays:
+#   dir_mtime q[D], dir_first q[D+1], dir_path_off q[D+1], entry_size q[N], entry_mtime d[N],
+#   entry_name_off q[N+1], entry_flags B[N], dir path blob, name blob
+index_state = {'snapshot': None, 'dirty': False, 'ready': False, 'paths': []}
+
+def snapshot_layout(header: dict) -> List[Tuple[str, str, int]]:
+    dirs, entries = header['dirs'], header['entries']
+    return [('dir_mtime', 'q', dirs), ('dir_first', 'q', dirs + 1), ('dir_path_off', 'q', dirs + 1),
+            ('entry_size', 'q', entries), ('entry_mtime', 'd', entries), ('entry_name_off', 'q', entries + 1),
+            ('entry_flags', 'B', entries), ('dir_paths', 'B', header['dir_paths_len']), ('names', 'B', header['names_len'])]
+
+def load_index_snapshot(index_path: str = INDEX_PATH):
+    try:
+        with open(index_path, 'rb') as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    view = memoryview(mm)
+    try:
+        if bytes(view[:8]) != INDEX_MAGIC:
+            return None
+        header_len, = struct.unpack_from('<I', mm, 8)
+        header = json.loads(bytes(view[12:12 + header_len]))
+        if header['base_dir'] != base_dir or header['byteorder'] != sys.byteorder:
+            return None
+        snapshot = {'mm': mm}
+        offset = 12 + header_len
+        for name, code, count in snapshot_layout(header):
+            offset += -offset % 8
+            width = struct.calcsize(code)
+            snapshot[name] = view[offset:offset + width * count].cast(code)
+            offset += width * count
+    except (ValueError, KeyError, TypeError, struct.error):
+        return None
+    dir_paths = bytes(snapshot['dir_paths'])
+    offsets = snapshot['dir_path_off']
+    # Only the folder table is decoded up front; entries stay in the mapping until asked for
+    snapshot['paths'] = [os.path.normpath(os.path.join(base_dir, os.fsdecode(dir_paths[offsets[i]:offsets[i + 1]])))
+                         for i in range(header['dirs'])]
+    snapshot['dirs'] = {path: i for i, path in enumerate(snapshot['paths'])}
+    return snapshot
+
+def snapshot_entries(snapshot: dict, dir_index: int) -> Tuple[List[tuple], frozenset]:
+    relative_dir = os.path.relpath(snapshot['paths'][dir_index], base_dir)
+    names, name_off = snapshot['names'], snapshot['entry_name_off']
+    entries, links = [], set()
+    for i in range(snapshot['dir_first'][dir_index], snapshot['dir_first'][dir_index + 1]):
+        name = os.fsdecode(bytes(names[name_off[i]:name_off[i + 1]]))
+        flags = snapshot['entry_flags'][i]
+        if flags & ENTRY_SYMLINK:
+            links.add(name)
+        relative_path = name if relative_dir == '.' else os.path.join(relative_dir, name)
+        entries.append(('folder' if flags & ENTRY_FOLDER else 'file', name, relative_path,
+                        snapshot['entry_size'][i], snapshot['entry_mtime'][i], get_file_type(name)))
+    return entries, frozenset(links)
+
+def snapshot_subfolders(snapshot: dict, dir_index: int) -> List[str]:
+    names, name_off, flags = snapshot['names'], snapshot['entry_name_off'], snapshot['entry_flags']
+    return [os.fsdecode(bytes(names[name_off[i]:name_off[i + 1]]))
+            for i in range(snapshot['dir_first'][dir_index], snapshot['dir_first'][dir_index + 1])
+            if flags[i] & ENTRY_FOLDER and not flags[i] & ENTRY_SYMLINK]
+
+def snapshot_listing(path: str):
+    snapshot = index_state['snapshot']
+    if snapshot is None or path not in snapshot['dirs']:
+        return None
+    dir_index = snapshot['dirs'][path]
+    listing = dir_cache[path] = make_listing(snapshot['dir_mtime'][dir_index], *snapshot_entries(snapshot, dir_index))
+    return listing
+
+def save_index_snapshot(paths: List[str], index_path: str = INDEX_PATH):
+    dir_mtime, dir_first, dir_path_off = array.array('q'), array.array('q', [0]), array.array('q', [0])
+    entry_size, entry_mtime, entry_name_off, entry_flags = array.array('q'), array.array('d'), array.array('q', [0]), array.array('B')
+    dir_paths, names = bytearray(), bytearray()
+    snapshot = index_state['snapshot']
+    for path in paths:
+        listing = dir_cache.get(path)
+        dir_index = snapshot['dirs'].get(path) if listing is None and snapshot is not None else None
+        if listing is None and dir_index is None:
+            continue
+        dir_paths += os.fsencode(os.path.relpath(path, base_dir))
+        dir_path_off.append(len(dir_paths))
+        if listing is None:
+            # Folders nobody opened are copied across as raw array slices, without decoding them
+            first, last = snapshot['dir_first'][dir_index], snapshot['dir_first'][dir_index + 1]
+            name_off = snapshot['entry_name_off']
+            dir_mtime.append(snapshot['dir_mtime'][dir_index])
+            entry_name_off.extend(len(names) + name_off[i + 1] - name_off[first] for i in range(first, last))
+            names += snapshot['names'][name_off[first]:name_off[last]]
+            entry_size.frombytes(snapshot['entry_size'][first:last].cast('B'))
+            entry_mtime.frombytes(snapshot['entry_mtime'][first:last].cast('B'))
+            entry_flags.frombytes(snapshot['entry_flags'][first:last].cast('B'))
+            dir_first.append(len(entry_size))
+            continue
+        dir_mtime.append(listing['dir_mtime'])
+        for entry in listing['entries']:
+            names += os.fsencode(entry[1])
+            entry_name_off.append(len(names))
+            entry_size.append(entry[3])
+            entry_mtime.append(entry[4])
+            entry_flags.append((ENTRY_FOLDER if entry[0] == 'folder' else 0) | (ENTRY_SYMLINK if entry[1] in listing['links'] else 0))
+        dir_first.append(len(entry_size))
+    header = json.dumps({'base_dir': base_dir, 'byteorder': sys.byteorder, 'dirs': len(dir_mtime), 'entries': len(entry_size),
+                         'dir_paths_len': len(dir_paths), 'names_len': len(names)}).encode()
+    os.makedirs(os.path.dirname(index_path), exist_ok=True)
+    tmp_path = f"{index_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(INDEX_MAGIC + struct.pack('<I', len(header)) + header)
+        for data in (dir_mtime, dir_first, dir_path_off, entry_size, entry_mtime, entry_name_off, entry_flags, dir_paths, names):
+            f.write(b'\0' * (-f.tell() % 8))
+            f.write(data)
+    os.replace(tmp_path, index_path)
+    index_state['dirty'] = False
+
+def reconcile_index():
+    # Walk the indexed tree folder by folder: one stat per folder, full rescans only where the mtime moved
+    visited = []
+    pending = [base_dir]
+    while pending:
+        path = pending.pop()
+        try:
+            dir_mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            dir_cache.pop(path, None)
+            continue
+        # Unchanged folders are compared and walked straight from the snapshot arrays, not decoded into dir_cache
+        listing = dir_cache.get(path)
+        snapshot = index_state['snapshot']
+        dir_index = snapshot['dirs'].get(path) if listing is None and snapshot is not None else None
+        if dir_index is not None and snapshot['dir_mtime'][dir_index] == dir_mtime:
+            subfolders = snapshot_subfolders(snapshot, dir_index)
         else:
-            tree.append(('file', item, relative_path))
-    return tree
+            if listing is None or listing['dir_mtime'] != dir_mtime:
+                try:
+                    listing = refresh_listing(path, dir_mtime)
+                except OSError:
+                    continue
+            subfolders = [entry[1] for entry in listing['entries'] if entry[0] == 'folder' and entry[1] not in listing['links']]
+        visited.append(path)
+        pending.extend(os.path.join(path, name) for name in subfolders)
+    index_state['paths'] = visited
+    index_state['ready'] = True
+    if index_state['dirty'] or index_state['snapshot'] is None:
+        save_index_snapshot(visited)
+
+def start_index():
+    index_state['snapshot'] = load_index_snapshot()
+    threading.Thread(target=reconcile_index, name='fs3-index', daemon=True).start()
+
+def stop_index():
+    # Keep folders refreshed by requests since the last reconcile
+    if index_state['ready'] and index_state['dirty']:
+        save_index_snapshot(sorted(set(index_state['paths']) | set(dir_cache)))
 
 def handle_file(path: str, preview: bool = False):
     full_path = os.path.normpath(os.path.join(base_dir, path))
@@ -206,15 +1875,929 @@ def handle_file(path: str, preview: bool = False):
     else:
         return FileResponse(full_path, media_type=mime_type, filename=os.path.basename(full_path))
 
-def handle_directory(path: str, search: str = ''):
+def handle_directory(path: str, search: str = '', view: dict = None, client_id: str = None):
     full_path = os.path.normpath(os.path.join(base_dir, path))
     
     if search:
-        tree = search_files(full_path, search)
+        try:
+            tree = client_search(client_id, full_path, search) if client_id else search_files(full_path, search)
+        except ValueError as e:
+            return P(f"Invalid search: {e}", cls="p-3 text-red-600 text-sm")
+        if tree is None:
+            # Superseded by a newer query from the same client; htmx leaves the page alone on 204
+            return Response(status_code=204)
+        return NotStr(render_file_list_html(tree, path))
     else:
-        tree = build_tree(full_path)
-    
-    return render_file_list(tree, path)
+        tree, total, kinds = list_directory(full_path, view)
+        return NotStr(render_file_list_html(tree, path, view, total, kinds))
+
+def make_view(sort: str = 'name', order: str = 'asc', folders_first: bool = False, kind: str = '', min_size: str = '',
+              max_size: str = '', after: str = '', before: str = '', page: int = 0, image_columns: bool = False) -> dict:
+    return {
+        'sort': sort if sort in SORT_COLUMNS else 'name', 'order': 'desc' if order == 'desc' else 'asc',
+        'folders_first': folders_first, 'kind': kind, 'min_size': min_size, 'max_size': max_size,
+        'after': after, 'before': before, 'page': max(page, 0), 'image_columns': image_columns,
+    }
+
+def resolve_path(path: str):
+    # commonpath rather than a prefix test, so a sibling such as <base_dir>2 is not accepted
+    full_path = os.path.normpath(os.path.join(base_dir, path))
+    return full_path if os.path.commonpath([base_dir, full_path]) == base_dir else None
+
+def is_upload_part(name: str) -> bool:
+    return name.startswith('.') and name.endswith('.part')
+
+def upload_part_path(target_path: str, upload_id: str) -> str:
+    # Keep the part file next to the target so the final rename stays on one filesystem
+    return os.path.join(os.path.dirname(target_path), f".{os.path.basename(target_path)}.{upload_id}.part")
+
+def parse_content_range(header: str):
+    # "bytes start-end/total"; a missing header means the body is the whole file
+    if not header:
+        return 0, None
+    match = re.fullmatch(r'bytes (\d+)-(\d+)/(\d+)', header.strip())
+    if not match:
+        return None
+    start, end, total = map(int, match.groups())
+    if end < start or end >= total:
+        return None
+    return start, total
+
+active_uploads = set()
+part_sweeps = {}
+
+def sweep_upload_parts(folder: str):
+    # Folders the index finds unchanged are never rescanned, so uploads also sweep their folder, at most hourly
+    now = time.monotonic()
+    if folder in part_sweeps and now - part_sweeps[folder] < 3600:
+        return
+    part_sweeps[folder] = now
+    with os.scandir(folder) as it:
+        for entry in it:
+            if is_upload_part(entry.name):
+                expire_upload_part(entry)
+
+async def write_upload_stream(request: Request, part_path: str, start: int) -> int:
+    offset = start
+    buffer = bytearray()
+    with open(part_path, 'r+b' if os.path.exists(part_path) else 'wb') as f:
+        f.seek(start)
+        f.truncate()
+        async for chunk in request.stream():
+            buffer += chunk
+            while len(buffer) >= UPLOAD_WRITE_SIZE:
+                block = bytes(buffer[:UPLOAD_WRITE_SIZE])
+                del buffer[:UPLOAD_WRITE_SIZE]
+                await asyncio.to_thread(f.write, block)
+                offset += len(block)
+        if buffer:
+            await asyncio.to_thread(f.write, bytes(buffer))
+            offset += len(buffer)
+        await asyncio.to_thread(os.fsync, f.fileno())
+    return offset
+
+async def handle_upload(request: Request):
+    target_path = resolve_path(request.path_params['path'])
+    upload_id = request.query_params.get('upload_id', '')
+    if target_path is None:
+        return Response("Access denied: Path is outside the allowed directory.", status_code=403)
+    if not re.fullmatch(r'[A-Za-z0-9_-]{1,64}', upload_id):
+        return Response("A valid upload_id is required", status_code=400)
+    if not os.path.isdir(os.path.dirname(target_path)) or os.path.isdir(target_path):
+        return Response("Upload target must be a file inside an existing folder", status_code=400)
+    overwrite = request.query_params.get('overwrite', '').lower() in ('1', 'true', 'yes')
+    if os.path.lexists(target_path) and not overwrite:
+        return JSONResponse({'exists': True}, status_code=409)
+
+    part_path = upload_part_path(target_path, upload_id)
+    received = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    if request.method == 'GET':
+        try:
+            await asyncio.to_thread(sweep_upload_parts, os.path.dirname(target_path))
+        except OSError:
+            pass
+        return JSONResponse({'offset': received})
+
+    content_range = parse_content_range(request.headers.get('content-range', ''))
+    if content_range is None:
+        return Response("Invalid Content-Range header", status_code=416)
+    start, total = content_range
+    if start != received:
+        # The client lost track after a dropped connection; tell it where to resume
+        return JSONResponse({'offset': received}, status_code=409)
+    if part_path in active_uploads:
+        return JSONResponse({'offset': received}, status_code=409)
+
+    folder = os.path.dirname(target_path)
+    active_uploads.add(part_path)
+    try:
+        dir_mtime = os.stat(folder).st_mtime_ns
+        offset = await write_upload_stream(request, part_path, start)
+        # Creating the hidden part file bumps the folder mtime; carry the cached listing over it
+        update_listing_entry(folder, os.path.basename(part_path), dir_mtime)
+    finally:
+        active_uploads.discard(part_path)
+
+    complete = total is None or offset >= total
+    if not complete:
+        return JSONResponse({'offset': offset, 'complete': False})
+    dir_mtime = os.stat(folder).st_mtime_ns
+    os.replace(part_path, target_path)
+    entry = update_listing_entry(folder, os.path.basename(target_path), dir_mtime) or stat_entry(target_path)
+    return JSONResponse({'offset': offset, 'complete': True, 'row_id': row_dom_id(entry[2]),
+                         'row': to_xml(render_file_row(entry, format_entry_cells(entry)))})
+
+def render_upload_form(path: str):
+    return Div(cls="p-4")(
+        Label(cls="block w-full p-4 border-2 border-dashed border-gray-300 rounded-md text-center text-sm text-gray-500 cursor-pointer",
+              id="upload-drop", data_path=path)(
+            "Drop files or click to upload",
+            Input(type="file", multiple=True, cls="hidden", id="upload-input"),
+        ),
+        Div(id="upload-status", cls="mt-2 text-xs text-gray-500"),
+        Script(f"""
+            const UPLOAD_CHUNK = {UPLOAD_CLIENT_CHUNK};
+            const uploadDir = document.getElementById('upload-drop').dataset.path;
+
+            function uploadUrl(file, uploadId) {{
+                const dir = uploadDir ? uploadDir.split('/').map(encodeURIComponent).join('/') + '/' : '';
+                return `/_upload/${{dir}}${{encodeURIComponent(file.name)}}?upload_id=${{uploadId}}`;
+            }}
+
+            async function uploadFile(file) {{
+                // Stable id so a retry after a dropped connection resumes the same part file
+                const uploadId = `${{file.size}}-${{file.lastModified}}`;
+                let url = uploadUrl(file, uploadId);
+                const status = document.getElementById('upload-status');
+                let probe = await (await fetch(url)).json();
+                if (probe.exists) {{
+                    // The server never replaces a file unless asked to
+                    if (!confirm(`${{file.name}} already exists here. Replace it?`)) {{
+                        status.textContent = `${{file.name}} skipped`;
+                        return;
+                    }}
+                    url += '&overwrite=1';
+                    probe = await (await fetch(url)).json();
+                }}
+                let offset = probe.offset;
+                let retries = 0;
+                let result = {{}};
+                while (true) {{
+                    const end = Math.min(offset + UPLOAD_CHUNK, file.size);
+                    const range = file.size ? `bytes ${{offset}}-${{end - 1}}/${{file.size}}` : '';
+                    try {{
+                        const resp = await fetch(url, {{method: 'PUT', body: file.slice(offset, end),
+                                                       headers: range ? {{'Content-Range': range}} : {{}}}});
+                        result = await resp.json();
+                        if (result.exists) {{ status.textContent = `${{file.name}} was created by someone else meanwhile`; return; }}
+                        offset = result.offset;
+                        retries = 0;
+                        if (result.complete) break;
+                    }} catch (err) {{
+                        if (++retries > 5) {{ status.textContent = `Upload of ${{file.name}} failed`; return; }}
+                        await new Promise(r => setTimeout(r, 1000 * retries));
+                        offset = (await (await fetch(url)).json()).offset;
+                    }}
+                    status.textContent = `${{file.name}}: ${{Math.floor(100 * offset / file.size)}}%`;
+                }}
+                status.textContent = `${{file.name}} uploaded`;
+                // The response carries just the new row; add it if its folder is the one on screen
+                const listing = document.querySelector('#file-list-container > [data-path]');
+                if (result.row && listing && listing.dataset.path === uploadDir && !document.getElementById(result.row_id)) {{
+                    htmx.swap('#file-rows', result.row, {{swapStyle: 'afterbegin'}});
+                }}
+            }}
+
+            async function uploadFiles(files) {{
+                for (const file of files) await uploadFile(file);
+            }}
+
+            const drop = document.getElementById('upload-drop');
+            drop.addEventListener('dragover', e => e.preventDefault());
+            drop.addEventListener('drop', e => {{ e.preventDefault(); uploadFiles(e.dataTransfer.files); }});
+            document.getElementById('upload-input').addEventListener('change', e => uploadFiles(e.target.files));
+        """)
+    )
+
+job_pool = ThreadPoolExecutor(max_workers=JOB_WORKERS)
+jobs = {}
+
+def plan_job_files(paths: List[str]) -> List[Tuple[str, str, int]]:
+    # (source root, file path, size) for every file below the selected entries
+    files = []
+    for root_path in paths:
+        if os.path.isfile(root_path) or os.path.islink(root_path):
+            files.append((root_path, root_path, os.lstat(root_path).st_size))
+            continue
+        for dirpath, dirnames, filenames in os.walk(root_path):
+            # os.walk lists a symlinked folder under dirnames without descending; it is handled as one link
+            links = [name for name in dirnames if os.path.islink(os.path.join(dirpath, name))]
+            for filename in filenames + links:
+                file_path = os.path.join(dirpath, filename)
+                try:
+                    files.append((root_path, file_path, os.lstat(file_path).st_size))
+                except OSError:
+                    pass
+    return files
+
+def copy_with_progress(job: dict, src: str, dst: str):
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    if os.path.islink(src):
+        os.symlink(os.readlink(src), dst)
+        return
+    # Copied under a hidden part name (skipped by listings) so a cancelled or failed copy never
+    # leaves a truncated file at the destination
+    part_path = upload_part_path(dst, job['id'])
+    complete = False
+    try:
+        with open(src, 'rb') as fsrc, open(part_path, 'wb') as fdst:
+            while not job['cancel'].is_set():
+                block = fsrc.read(JOB_COPY_BUFFER)
+                if not block:
+                    complete = True
+                    break
+                fdst.write(block)
+                job['bytes_done'] += len(block)
+        if complete:
+            shutil.copystat(src, part_path)
+            # Checked again here because the destination may have changed since the job was accepted
+            if os.path.lexists(dst):
+                raise FileExistsError(errno.EEXIST, "Already exists", os.path.relpath(dst, base_dir))
+            os.replace(part_path, dst)
+    finally:
+        if not complete and os.path.exists(part_path):
+            os.remove(part_path)
+
+def remove_empty_dirs(root_path: str):
+    if os.path.isdir(root_path) and not os.path.islink(root_path):
+        for dirpath, _, _ in sorted(os.walk(root_path), key=lambda entry: -len(entry[0])):
+            try:
+                os.rmdir(dirpath)
+            except OSError:
+                pass
+
+def run_job(job: dict):
+    job['status'] = 'running'
+    sources = job['paths']
+    try:
+        if job['op'] == 'move':
+            pending = []
+            for root_path in sources:
+                # A rename within one filesystem moves a whole tree without touching file data
+                target = os.path.join(job['dest'], os.path.basename(root_path))
+                if os.path.lexists(target):
+                    raise FileExistsError(errno.EEXIST, "Already exists", os.path.relpath(target, base_dir))
+                try:
+                    os.rename(root_path, target)
+                    job['files_done'] += 1
+                except OSError:
+                    pending.append(root_path)
+            sources = pending
+
+        files = plan_job_files(sources)
+        job['files_total'] = job['files_done'] + len(files)
+        job['bytes_total'] = sum(size for _, _, size in files)
+
+        for root_path, file_path, size in files:
+            if job['cancel'].is_set():
+                break
+            if job['op'] in ('copy', 'move'):
+                target = os.path.join(job['dest'], os.path.basename(root_path), os.path.relpath(file_path, root_path)) \
+                    if file_path != root_path else os.path.join(job['dest'], os.path.basename(root_path))
+                copy_with_progress(job, file_path, os.path.normpath(target))
+                if job['cancel'].is_set():
+                    break
+            else:
+                job['bytes_done'] += size
+            if job['op'] in ('delete', 'move'):
+                os.remove(file_path)
+            job['files_done'] += 1
+
+        if job['op'] in ('delete', 'move') and not job['cancel'].is_set():
+            for root_path in sources:
+                remove_empty_dirs(root_path)
+            remaining = [root_path for root_path in sources if os.path.lexists(root_path)]
+            if remaining:
+                job['status'] = 'failed'
+                job['error'] = f"Could not remove {', '.join(os.path.relpath(path, base_dir) for path in remaining)}"
+                return
+        job['status'] = 'cancelled' if job['cancel'].is_set() else 'done'
+    except OSError as e:
+        job['status'] = 'failed'
+        job['error'] = str(e)
+
+def start_job(op: str, paths: List[str], dest: str = None) -> dict:
+    job = {
+        'id': uuid.uuid4().hex[:12], 'op': op, 'paths': paths, 'dest': dest, 'status': 'queued', 'error': None,
+        'files_done': 0, 'files_total': len(paths), 'bytes_done': 0, 'bytes_total': 0, 'cancel': threading.Event(),
+    }
+    finished = [job_id for job_id, other in jobs.items() if other['status'] in ('done', 'failed', 'cancelled')]
+    for job_id in finished[:max(0, len(jobs) - JOB_HISTORY)]:
+        del jobs[job_id]
+    jobs[job['id']] = job
+    job_pool.submit(run_job, job)
+    return job
+
+def job_finished(job: dict) -> bool:
+    return job['status'] in ('done', 'failed', 'cancelled')
+
+def render_job_progress(job: dict) -> Div:
+    percent = int(100 * job['bytes_done'] / job['bytes_total']) if job['bytes_total'] else (100 if job_finished(job) else 0)
+    return Div(id=f"job-{job['id']}", cls="p-2 border-b border-gray-200 text-xs text-gray-600")(
+        Div(cls="flex justify-between")(
+            Span(f"{job['op'].capitalize()} {len(job['paths'])} item(s): {job['status']}"),
+            None if job_finished(job) else
+                Button("Cancel", hx_post=f"/_jobs/{job['id']}/cancel", hx_swap="none", cls="text-red-600 hover:underline"),
+        ),
+        Div(f"{job['files_done']}/{job['files_total']} files, {format_size(job['bytes_done'])} of {format_size(job['bytes_total'])}"),
+        Div(cls="w-full bg-gray-200 rounded h-1 mt-1")(Div(cls="bg-blue-500 h-1 rounded", style=f"width: {percent}%")),
+        P(job['error'], cls="text-red-600") if job['error'] else None,
+    )
+
+async def job_events(job: dict):
+    last = None
+    while True:
+        state = (job['status'], job['files_done'], job['bytes_done'], job['files_total'])
+        if state != last:
+            last = state
+            if job_finished(job):
+                yield sse_message(render_job_progress(job), event='done')
+                return
+            yield sse_message(render_job_progress(job))
+        await asyncio.sleep(0.5)
+
+def render_job_toolbar():
+    return Div(cls="p-4 border-t border-gray-200")(
+        Div("Selected items", cls="text-xs font-medium text-gray-500 uppercase mb-2"),
+        Input(type="text", id="job-dest", name="dest", placeholder="Destination folder",
+              cls="w-full p-1 mb-2 border border-gray-300 rounded-md text-sm"),
+        Div(cls="flex space-x-2 text-sm")(
+            *[Button(label, hx_post="/_jobs", hx_vals=json.dumps({'op': op}), hx_include=".row-select:checked, #job-dest",
+                     hx_target="#jobs", hx_swap="afterbegin", hx_confirm=confirm,
+                     cls="px-2 py-1 bg-gray-100 rounded hover:bg-gray-200")
+              for label, op, confirm in (("Delete", "delete", "Delete the selected items? Folders are deleted with everything in them."),
+                                         ("Move", "move", None), ("Copy", "copy", None))]
+        ),
+        Div(id="jobs", cls="mt-2 max-h-64 overflow-auto"),
+        Script("""
+            function watchJobs() {
+                document.querySelectorAll('[data-job]:not([data-watching])').forEach(el => {
+                    el.dataset.watching = '1';
+                    const jobId = el.dataset.job;
+                    const events = new EventSource(`/_jobs/${jobId}/events`);
+                    const update = e => { document.getElementById(`job-${jobId}`).outerHTML = e.data; };
+                    events.onmessage = update;
+                    events.addEventListener('done', e => {
+                        events.close();
+                        update(e);
+                    });
+                });
+            }
+            document.body.addEventListener('htmx:afterSettle', watchJobs);
+        """)
+    )
+
+hash_pool = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix='fs3-hash')
+hash_state = {'db': None, 'pending': {}, 'errors': {}}
+hash_lock = threading.Lock()
+
+def hash_cache() -> sqlite3.Connection:
+    # Callers hold hash_lock; the connection is shared by the request and hashing threads
+    if hash_state['db'] is None:
+        os.makedirs(os.path.dirname(HASH_CACHE_PATH), exist_ok=True)
+        db = sqlite3.connect(HASH_CACHE_PATH, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.execute("CREATE TABLE IF NOT EXISTS checksums (path TEXT PRIMARY KEY, size INTEGER, "
+                   "mtime_ns INTEGER, inode INTEGER, sha256 TEXT, fast TEXT)")
+        hash_state['db'] = db
+    return hash_state['db']
+
+def checksum_key(st: os.stat_result) -> tuple:
+    return st.st_size, st.st_mtime_ns, st.st_ino
+
+def cached_checksums(file_path: str, st: os.stat_result) -> dict:
+    with hash_lock:
+        row = hash_cache().execute("SELECT size, mtime_ns, inode, sha256, fast FROM checksums WHERE path = ?",
+                                   (file_path,)).fetchone()
+    if row is None or tuple(row[:3]) != checksum_key(st):
+        return None
+    return {'sha256': row[3], 'fast': row[4]}
+
+def compute_checksums(file_path: str) -> dict:
+    st = os.stat(file_path)
+    sha256 = hashlib.sha256()
+    fast, crc = xxhash.xxh3_64() if xxhash is not None else None, 0
+    buffer = bytearray(HASH_BUFFER_SIZE)
+    view = memoryview(buffer)
+    with open(file_path, 'rb', buffering=0) as f:
+        if hasattr(os, 'posix_fadvise'):
+            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        while n := f.readinto(buffer):
+            # hashlib and zlib release the GIL on large updates, so workers hash in parallel
+            sha256.update(view[:n])
+            if fast is not None:
+                fast.update(view[:n])
+            else:
+                crc = zlib.crc32(view[:n], crc)
+    result = {'sha256': sha256.hexdigest(),
+              'fast': f"xxh3_64:{fast.hexdigest()}" if fast is not None else f"crc32:{crc:08x}"}
+    # A file that changed while it was being read gets rehashed next time instead of cached
+    if checksum_key(os.stat(file_path)) == checksum_key(st):
+        with hash_lock:
+            db = hash_cache()
+            db.execute("INSERT OR REPLACE INTO checksums VALUES (?, ?, ?, ?, ?, ?)",
+                       (file_path, *checksum_key(st), result['sha256'], result['fast']))
+            db.commit()
+    return result
+
+def checksums_finished(file_path: str, future):
+    with hash_lock:
+        hash_state['pending'].pop(file_path, None)
+        if not future.cancelled() and future.exception() is not None:
+            hash_state['errors'][file_path] = str(future.exception())
+
+def checksum_status(file_path: str, st: os.stat_result, queue: bool = False) -> dict:
+    entry = {'path': os.path.relpath(file_path, base_dir), 'size': st.st_size, 'mtime': st.st_mtime}
+    cached = cached_checksums(file_path, st)
+    if cached is not None:
+        return {**entry, 'status': 'done', **cached}
+    with hash_lock:
+        if file_path in hash_state['pending']:
+            return {**entry, 'status': 'pending'}
+        if not queue:
+            error = hash_state['errors'].get(file_path)
+            return {**entry, 'status': 'error', 'error': error} if error else {**entry, 'status': 'missing'}
+        hash_state['errors'].pop(file_path, None)
+        future = hash_state['pending'][file_path] = hash_pool.submit(compute_checksums, file_path)
+    future.add_done_callback(lambda f: checksums_finished(file_path, f))
+    return {**entry, 'status': 'pending'}
+
+def folder_checksums(folder_path: str, queue: bool = False) -> dict:
+    # Unchanged files are answered from the cache, so re-verifying a folder costs one stat per file
+    entries = []
+    stack = [folder_path]
+    while stack:
+        folder = stack.pop()
+        try:
+            with os.scandir(folder) as it:
+                found = list(it)
+        except OSError as e:
+            # An unreadable folder is reported like a file that failed to hash, and the walk goes on
+            entries.append({'path': os.path.relpath(folder, base_dir), 'status': 'error', 'error': str(e)})
+            continue
+        for entry in found:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file(follow_symlinks=False) and not is_upload_part(entry.name):
+                    entries.append(checksum_status(entry.path, entry.stat(follow_symlinks=False), queue))
+            except OSError as e:
+                entries.append({'path': os.path.relpath(entry.path, base_dir), 'status': 'error', 'error': str(e)})
+    entries.sort(key=lambda item: item['path'])
+    counts = {status: sum(1 for item in entries if item['status'] == status)
+              for status in ('done', 'pending', 'missing', 'error')}
+    return {'path': os.path.relpath(folder_path, base_dir), 'files': len(entries), **counts, 'entries': entries}
+
+def stop_hashing():
+    hash_pool.shutdown(wait=False, cancel_futures=True)
+
+def render_file_checksums(file_path: str, status: dict = None) -> Div:
+    status = status or checksum_status(file_path, os.stat(file_path))
+    url = f"/_hash/{quote(os.path.relpath(file_path, base_dir))}"
+    attrs = dict(id="checksums", cls="mt-4 text-xs text-gray-600")
+    if status['status'] == 'done':
+        algorithm, _, fast = status['fast'].partition(':')
+        return Div(**attrs)(
+            Div(Span("SHA-256 ", cls="font-medium"), Span(status['sha256'], cls="font-mono break-all")),
+            Div(Span(f"{algorithm} ", cls="font-medium"), Span(fast, cls="font-mono")),
+        )
+    if status['status'] == 'pending':
+        return Div(hx_get=url, hx_trigger="every 1s", hx_swap="outerHTML", **attrs)("Computing checksums...")
+    return Div(**attrs)(
+        P(f"Checksum failed: {status['error']}", cls="text-red-600") if status['status'] == 'error' else None,
+        Button("Compute checksums", hx_post=url, hx_target="#checksums", hx_swap="outerHTML",
+               cls="px-2 py-1 bg-gray-100 rounded hover:bg-gray-200"),
+    )
+
+def checksum_response(path: str, queue: bool, hx_request: bool):
+    full_path = resolve_path(path)
+    if full_path is None:
+        return Response("Access denied: Path is outside the allowed directory.", status_code=403)
+    if os.path.isdir(full_path):
+        return JSONResponse(folder_checksums(full_path, queue))
+    if not os.path.isfile(full_path):
+        return Response("File not found", status_code=404)
+    status = checksum_status(full_path, os.stat(full_path), queue)
+    return render_file_checksums(full_path, status) if hx_request else JSONResponse(status)
+
+dupe_scans = OrderedDict()
+dupe_pool = ThreadPoolExecutor(max_workers=DUPE_WORKERS, thread_name_prefix='fs3-dupes')
+
+def walk_files(folder_path: str, cancelled):
+    # Sizes come from the index where a folder is unchanged, otherwise from one scandir stat per file
+    pending = [folder_path]
+    while pending:
+        if cancelled():
+            return
+        root = pending.pop()
+        listing = indexed_listing(root)
+        if listing is not None:
+            for kind, name, relative_path, size, _, _ in listing['entries']:
+                if name in listing['links']:
+                    continue
+                if kind == 'folder':
+                    pending.append(os.path.join(root, name))
+                else:
+                    yield os.path.join(base_dir, relative_path), size
+            continue
+        try:
+            with os.scandir(root) as it:
+                entries = list(it)
+        except OSError:
+            continue
+        for entry in entries:
+            if is_upload_part(entry.name):
+                continue
+            try:
+                if entry.is_symlink():
+                    continue
+                if entry.is_dir():
+                    pending.append(entry.path)
+                else:
+                    yield entry.path, entry.stat().st_size
+            except OSError:
+                continue
+
+def partial_digest(file_path: str) -> Tuple[int, tuple, bytes]:
+    # The listed size can be stale (rewriting a file in place leaves its folder mtime alone), so the
+    # size that decides which blocks are read, and that files are grouped by, is the one fstat reports
+    with open(file_path, 'rb') as f:
+        st = os.fstat(f.fileno())
+        data = f.read(DUPE_BLOCK_SIZE)
+        if st.st_size > DUPE_BLOCK_SIZE:
+            f.seek(max(DUPE_BLOCK_SIZE, st.st_size - DUPE_BLOCK_SIZE))
+            data += f.read(DUPE_BLOCK_SIZE)
+    return st.st_size, (st.st_dev, st.st_ino), hashlib.blake2b(data, digest_size=16).digest()
+
+def full_digest(scan: dict, file_path: str) -> str:
+    st = os.stat(file_path)
+    cached = cached_checksums(file_path, st)
+    if cached is not None:
+        return cached['sha256']
+    scan['bytes_read'] += st.st_size
+    return compute_checksums(file_path)['sha256']
+
+def refine_groups(scan: dict, groups: List[list], digest, done_key: str) -> List[list]:
+    # Split each group by digest on the hash pool; files that cannot be read drop out
+    futures = {hash_pool.submit(digest, path): (index, path) for index, group in enumerate(groups) for path in group}
+    refined = {}
+    for future in as_completed(futures):
+        if scan['cancel'].is_set():
+            for other in futures:
+                other.cancel()
+            return []
+        index, path = futures[future]
+        scan[done_key] += 1
+        try:
+            refined.setdefault((index, future.result()), []).append(path)
+        except OSError:
+            continue
+    return [sorted(group) for group in refined.values() if len(group) > 1]
+
+def run_dupe_scan(scan: dict):
+    try:
+        scan['stage'] = 'sizes'
+        by_size = {}
+        for file_path, size in walk_files(scan['root'], scan['cancel'].is_set):
+            scan['files'] += 1
+            scan['bytes_total'] += size
+            if size > 0:
+                by_size.setdefault(size, []).append(file_path)
+        groups = [paths for paths in by_size.values() if len(paths) > 1]
+        scan['stage'] = 'partial'
+        scan['partial_total'] = sum(len(paths) for paths in groups)
+        scan['bytes_read'] += sum(min(size, 2 * DUPE_BLOCK_SIZE) * len(paths) for size, paths in by_size.items()
+                                  if len(paths) > 1)
+        files = {}  # path -> (size, (st_dev, st_ino)) as seen when its partial digest was read
+
+        def partial(path: str) -> tuple:
+            size, file_id, digest = partial_digest(path)
+            files[path] = size, file_id
+            return size, digest
+
+        # Hard links to one inode are a single file, not copies that could be reclaimed
+        distinct = lambda group: len({files[path][1] for path in group})
+        groups = [group for group in refine_groups(scan, groups, partial, 'partial_done') if distinct(group) > 1]
+        # Files no bigger than the two end blocks were compared whole by the partial digest
+        final = [group for group in groups if files[group[0]][0] <= 2 * DUPE_BLOCK_SIZE]
+        groups = [group for group in groups if files[group[0]][0] > 2 * DUPE_BLOCK_SIZE]
+        scan['stage'] = 'full'
+        scan['full_total'] = sum(len(group) for group in groups)
+        final += [group for group in refine_groups(scan, groups, lambda path: full_digest(scan, path), 'full_done')
+                  if distinct(group) > 1]
+        if scan['cancel'].is_set():
+            scan['status'] = 'cancelled'
+            return
+        scan['groups'] = sorted(((files[group[0]][0], distinct(group), group) for group in final),
+                                key=lambda item: item[0] * (item[1] - 1), reverse=True)
+        scan['status'] = 'done'
+    except Exception as e:
+        scan['status'], scan['error'] = 'failed', str(e)
+
+def start_dupe_scan(folder_path: str) -> dict:
+    # Asking again for a folder that is still being scanned follows the scan already under way
+    for scan in dupe_scans.values():
+        if scan['root'] == folder_path and scan['status'] == 'running' and not scan['cancel'].is_set():
+            return scan
+    scan = {'id': uuid.uuid4().hex[:12], 'root': folder_path, 'status': 'running', 'stage': 'queued', 'error': None,
+            'files': 0, 'bytes_total': 0, 'bytes_read': 0, 'partial_total': 0, 'partial_done': 0,
+            'full_total': 0, 'full_done': 0, 'groups': [], 'cancel': threading.Event()}
+    dupe_scans[scan['id']] = scan
+    while len(dupe_scans) > DUPE_HISTORY:
+        dupe_scans.pop(next(iter(dupe_scans)))['cancel'].set()
+    # Scans evicted from the history are cancelled, so at most DUPE_HISTORY of them can be waiting
+    dupe_pool.submit(run_dupe_scan, scan)
+    return scan
+
+def stop_dupe_scans():
+    for scan in list(dupe_scans.values()):
+        scan['cancel'].set()
+    dupe_pool.shutdown(wait=False, cancel_futures=True)
+
+def render_dupe_scan(scan: dict) -> Div:
+    folder = os.path.relpath(scan['root'], base_dir)
+    title = f"Duplicates in /{'' if folder == '.' else folder}"
+    read_share = f"{100 * scan['bytes_read'] / scan['bytes_total']:.1f}%" if scan['bytes_total'] else "0%"
+    progress = Div(cls="text-xs text-gray-600 mb-2")(
+        Div(f"{scan['files']:,} files, {format_size(scan['bytes_total'])} in total"),
+        Div(f"Partial hashes: {scan['partial_done']:,}/{scan['partial_total']:,}") if scan['stage'] in ('partial', 'full') else None,
+        Div(f"Full hashes: {scan['full_done']:,}/{scan['full_total']:,}") if scan['stage'] == 'full' else None,
+        Div(f"Read {format_size(scan['bytes_read'])} ({read_share} of the data)"),
+    )
+    if scan['status'] == 'running':
+        return Div(id="dupe-scan", cls="file-preview w-full h-full", hx_get=f"/_dupes/{scan['id']}",
+                   hx_trigger="every 1s", hx_swap="outerHTML")(
+            H3(title, cls="text-lg font-semibold mb-2"),
+            Div(cls="flex justify-between text-sm text-gray-600 mb-2")(
+                Span("Waiting for another scan to finish" if scan['stage'] == 'queued' else f"Scanning: {scan['stage']} stage"),
+                Button("Cancel", hx_post=f"/_dupes/{scan['id']}/cancel", hx_swap="none", cls="text-red-600 hover:underline"),
+            ),
+            progress,
+        )
+    wasted = sum(size * (copies - 1) for size, copies, _ in scan['groups'])
+    return Div(id="dupe-scan", cls="file-preview w-full h-full")(
+        H3(title, cls="text-lg font-semibold mb-2"),
+        progress,
+        P(f"Scan {scan['status']}: {scan['error']}", cls="text-red-600 text-sm") if scan['status'] != 'done' else
+            P(f"{len(scan['groups']):,} duplicate groups, {format_size(wasted)} reclaimable", cls="text-sm mb-2"),
+        *[Div(cls="mb-3 text-sm")(
+            Div(f"{copies} copies of {format_size(size)}" +
+                (f", {len(paths) - copies} more hard links" if len(paths) > copies else ""), cls="font-medium"),
+            *[Div(cls="pl-2 text-xs break-all")(
+                A(os.path.relpath(path, base_dir), href=f"/{quote(os.path.relpath(os.path.dirname(path), base_dir))}",
+                  cls="text-blue-600 hover:underline"))
+              for path in paths])
+          for size, copies, paths in scan['groups'][:DUPE_RESULT_GROUPS]],
+        P(f"Showing the largest {DUPE_RESULT_GROUPS} groups", cls="text-xs text-gray-500 italic")
+            if len(scan['groups']) > DUPE_RESULT_GROUPS else None,
+    )
+
+def profile_authorized(token: str, x_fs3_profile: str) -> bool:
+    supplied = token or x_fs3_profile
+    return bool(PROFILE_TOKEN) and bool(supplied) and hmac.compare_digest(supplied, PROFILE_TOKEN)
+
+def list_profiles() -> List[dict]:
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    profiles = []
+    for name in sorted(os.listdir(PROFILE_DIR), reverse=True):
+        if name.endswith('.json'):
+            try:
+                with open(os.path.join(PROFILE_DIR, name)) as f:
+                    profiles.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+    return profiles
+
+def read_profile_stacks(profile_id: str) -> dict:
+    stacks = {}
+    with open(os.path.join(PROFILE_DIR, f"{profile_id}.folded")) as f:
+        for line in f:
+            stack, _, count = line.rstrip('\n').rpartition(' ')
+            stacks[stack] = int(count)
+    return stacks
+
+def speedscope_profile(meta: dict, stacks: dict) -> dict:
+    frames, index = [], {}
+    samples, weights = [], []
+    for stack, count in stacks.items():
+        sample = []
+        for name in stack.split(';'):
+            if name not in index:
+                index[name] = len(frames)
+                frames.append({'name': name})
+            sample.append(index[name])
+        samples.append(sample)
+        weights.append(count * meta['interval'])
+    return {'$schema': 'https://www.speedscope.app/file-format-schema.json', 'exporter': 'fs3',
+            'name': f"{meta['method']} {meta['path']}", 'activeProfileIndex': 0, 'shared': {'frames': frames},
+            'profiles': [{'type': 'sampled', 'name': f"{meta['method']} {meta['path']}", 'unit': 'seconds',
+                          'startValue': 0, 'endValue': sum(weights), 'samples': samples, 'weights': weights}]}
+
+def render_flame_node(node: dict, total: int):
+    children = [child for child in sorted(node['children'].values(), key=lambda child: -child['count'])
+                if child['count'] / total >= PROFILE_MIN_SHARE]
+    hue = sum(map(ord, node['name'])) % 40
+    return Div(style=f"width: {100 * node['count'] / node['parent']:.3f}%; min-width: 0")(
+        Div(node['name'], title=f"{node['name']}: {node['count']} samples ({100 * node['count'] / total:.1f}%)",
+            style=f"background: hsl({hue}, 80%, 65%); overflow: hidden; white-space: nowrap; text-overflow: ellipsis; "
+                  "font-size: 11px; line-height: 18px; padding: 0 2px; border: 1px solid white"),
+        Div(style="display: flex")(*[render_flame_node(child, total) for child in children]) if children else None,
+    )
+
+def render_profile(profile_id: str) -> Div:
+    # Icicle layout: the root on top, callees below, widths proportional to samples
+    meta = next((meta for meta in list_profiles() if meta['id'] == profile_id), None)
+    stacks = read_profile_stacks(profile_id)
+    root = {'name': 'all', 'count': 0, 'parent': 1, 'children': {}}
+    for stack, count in stacks.items():
+        root['count'] += count
+        node = root
+        for name in stack.split(';'):
+            child = node['children'].setdefault(name, {'name': name, 'count': 0, 'parent': 0, 'children': {}})
+            child['count'] += count
+            node = child
+    def set_parents(node):
+        for child in node['children'].values():
+            child['parent'] = node['count']
+            set_parents(child)
+    set_parents(root)
+    root['parent'] = root['count'] or 1
+    return Div(
+        H3(f"{meta['method']} {meta['path']}" if meta else profile_id, cls="text-lg font-semibold mb-2"),
+        P(f"{root['count']} samples every {PROFILE_INTERVAL * 1000:.0f} ms", cls="text-xs text-gray-500 mb-2"),
+        render_flame_node(root, root['count'] or 1),
+    )
+
+def render_profiles_page(token: str):
+    link_cls = "text-blue-600 hover:underline cursor-pointer"
+    rows = [Tr(cls="border-b border-gray-200")(
+                Td(datetime.datetime.fromtimestamp(meta['time']).strftime('%Y-%m-%d %H:%M:%S'), cls="p-2"),
+                Td(f"{meta['method']} {meta['path']}{'?' + meta['query'] if meta['query'] else ''}", cls="p-2 truncate"),
+                Td(str(meta['status']), cls="p-2"),
+                Td(f"{meta['duration'] * 1000:.1f} ms", cls="p-2 text-right"),
+                Td(f"{meta['samples']}{' (truncated)' if meta.get('truncated') else ''}", cls="p-2 text-right"),
+                Td(cls="p-2 space-x-2")(
+                    A("flame graph", hx_get=f"/_profiles/{meta['id']}?{urlencode({'token': token})}",
+                      hx_target="#profile-view", cls=link_cls),
+                    A("speedscope", href=f"/_profiles/{meta['id']}?{urlencode({'token': token, 'format': 'speedscope'})}", cls=link_cls),
+                    A("collapsed", href=f"/_profiles/{meta['id']}?{urlencode({'token': token, 'format': 'folded'})}", cls=link_cls),
+                ))
+            for meta in list_profiles()]
+    return Title("Request profiles"), Div(cls="p-6 bg-gray-100 min-h-screen text-sm")(
+        H2("Request profiles", cls="text-lg font-semibold mb-4"),
+        P("Profile a request by sending X-FS3-Profile: <token> or adding ?_profile=<token>. "
+          "Open speedscope files at https://www.speedscope.app.", cls="text-gray-600 mb-4"),
+        Div(cls="bg-white rounded-lg shadow-md overflow-auto mb-4")(
+            Table(cls="w-full text-left")(
+                Thead(Tr(*[Th(label, cls="p-2") for label in ("Time", "Request", "Status", "Duration", "Samples", "")])),
+                Tbody(*rows) if rows else Tbody(Tr(Td("No profiles yet", cls="p-2 text-gray-500 italic"))),
+            )
+        ),
+        Div(id="profile-view", cls="bg-white rounded-lg shadow-md p-4 overflow-auto"),
+    )
+
+dir_watchers = {}
+
+def current_listing(path: str, changed: bool) -> dict:
+    # A filesystem event may be a file growing in place, which leaves the folder mtime alone
+    return refresh_listing(path, os.stat(path).st_mtime_ns) if changed else get_directory_listing(path)
+
+async def watch_directory(watcher: dict, stop: asyncio.Event):
+    # watchfiles batches events over the debounce window, which is what coalesces bursts
+    async for _ in awatch(watcher['path'], recursive=False, stop_event=stop, debounce=LIVE_COALESCE_MS,
+                          watch_filter=lambda change, path: not is_upload_part(os.path.basename(path))):
+        watcher['wake'].set()
+
+async def run_dir_watcher(watcher: dict):
+    stop = asyncio.Event()
+    events = asyncio.create_task(watch_directory(watcher, stop)) if awatch is not None else None
+    try:
+        while watcher['subscribers']:
+            try:
+                await asyncio.wait_for(watcher['wake'].wait(), LIVE_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            changed = watcher['wake'].is_set()
+            watcher['wake'].clear()
+            if not watcher['subscribers']:
+                break
+            try:
+                listing = await asyncio.to_thread(current_listing, watcher['path'], changed)
+            except OSError:
+                continue
+            entries = {entry[1]: entry for entry in listing['entries']}
+            previous = watcher['entries']
+            watcher['entries'] = entries
+            changes = {name for name in entries.keys() | previous.keys() if entries.get(name) != previous.get(name)}
+            if not changes:
+                continue
+            for queue in list(watcher['subscribers']):
+                try:
+                    queue.put_nowait((listing, changes))
+                except asyncio.QueueFull:
+                    while not queue.empty():
+                        queue.get_nowait()
+                    queue.put_nowait(None)
+    finally:
+        # Unregistered in the same step that finds no subscribers, like run_tailer
+        if dir_watchers.get(watcher['path']) is watcher:
+            del dir_watchers[watcher['path']]
+        stop.set()
+        if events is not None:
+            events.cancel()
+
+def visible_rows(listing: dict, view: dict) -> List[tuple]:
+    order = view_order(listing, view)
+    first = view['page'] * LISTING_PAGE_SIZE
+    return [listing['entries'][i] for i in order[first:first + LISTING_PAGE_SIZE]]
+
+def render_listing_changes(rows: List[tuple], shown: List[tuple], changes: set, image_columns: bool) -> list:
+    # Out-of-band swaps applied in document order: drop rows that left the page or changed, then
+    # insert each missing row after its predecessor so every insert has a target that exists
+    names = {entry[1] for entry in rows}
+    parts = [Tr(id=row_dom_id(entry[2]), hx_swap_oob="delete") for entry in shown
+             if entry[1] not in names or entry[1] in changes]
+    kept = {entry[1] for entry in shown if entry[1] in names and entry[1] not in changes}
+    previous = None
+    for entry in rows:
+        if entry[1] not in kept:
+            target = f"afterend:#{row_dom_id(previous[2])}" if previous else "afterbegin:#file-rows"
+            parts.append(Tbody(hx_swap_oob=target)(render_file_row(entry, format_entry_cells(entry, image_columns))))
+        previous = entry
+    return parts
+
+async def listing_events(full_path: str, view: dict):
+    watcher = dir_watchers.get(full_path)
+    if watcher is None:
+        listing = await asyncio.to_thread(get_directory_listing, full_path)
+        watcher = dir_watchers.get(full_path)
+        if watcher is None:
+            watcher = dir_watchers[full_path] = {
+                'path': full_path, 'entries': {entry[1]: entry for entry in listing['entries']},
+                'subscribers': set(), 'wake': asyncio.Event(), 'task': None}
+    queue = asyncio.Queue(LIVE_QUEUE_SIZE)
+    watcher['subscribers'].add(queue)
+    if watcher['task'] is None:
+        watcher['task'] = asyncio.create_task(run_dir_watcher(watcher))
+    # get_directory_listing may rescan the folder, so it runs on the worker thread as well
+    shown = await asyncio.to_thread(lambda: visible_rows(get_directory_listing(full_path), view))
+    try:
+        while True:
+            update = await queue.get()
+            if update is None:
+                # Fell too far behind to patch rows; the page refetches its listing once
+                yield sse_message('reload', event='reload')
+                shown = await asyncio.to_thread(lambda: visible_rows(get_directory_listing(full_path), view))
+                continue
+            listing, changes = update
+            rows = await asyncio.to_thread(visible_rows, listing, view)
+            parts = render_listing_changes(rows, shown, changes, view['image_columns'])
+            shown = rows
+            if parts:
+                yield sse_message(tuple(parts), event='rows')
+    finally:
+        watcher['subscribers'].discard(queue)
+        watcher['wake'].set()  # Lets the watcher notice it has no viewers left
+
+def render_live_listing_script():
+    return Script("""
+        let liveListing = null;
+        function followListing() {
+            // Re-subscribe whenever the listing is swapped for another folder, page or sort order
+            const listing = document.querySelector('[data-live]');
+            const url = listing ? listing.dataset.live : null;
+            if (liveListing && liveListing.path === url) return;
+            if (liveListing) liveListing.close();
+            liveListing = null;
+            if (!url) return;
+            liveListing = new EventSource(url);
+            liveListing.path = url;
+            liveListing.addEventListener('rows', e => {
+                // A row may already be on the page (an upload adds its own); the feed's copy replaces it
+                const batch = document.createElement('template');
+                batch.innerHTML = e.data;
+                batch.content.querySelectorAll('tbody > tr[id]').forEach(row => document.getElementById(row.id)?.remove());
+                htmx.swap('#file-list-container', e.data, {swapStyle: 'none'});
+            });
+            liveListing.addEventListener('reload', () => {
+                htmx.ajax('GET', listing.dataset.listing, {target: '#file-list-container'});
+            });
+        }
+        document.body.addEventListener('htmx:afterSettle', followListing);
+        followListing();
+    """)
 
 def render_main_page(path: str, file_list: Div):
     breadcrumb_items = [
@@ -229,11 +2812,15 @@ def render_main_page(path: str, file_list: Div):
             Div(cls="p-4")(
                 Input(type="text", cls="w-full p-2 border border-gray-300 rounded-md focus:outline-none focus:ring-2 focus:ring-blue-500",
                     placeholder="Search files...",
+                    title="Terms are combined: name globs, re:<regex>, path:<glob>, type:folder, kind:csv, size:>100MB, modified:<7d",
                     hx_get=f"/{path}", hx_trigger="keyup changed delay:100ms", 
                     hx_target="#file-list-container",
+                    hx_sync="this:replace",
                     hx_push_url="false",
                     name="search"),
             ),
+            render_upload_form(path),
+            render_job_toolbar(),
             Div(cls="mt-4")(
                 Div("All", cls="px-4 py-2 bg-blue-500 text-white cursor-pointer"),
                 Div("Local", cls="px-4 py-2 hover:bg-gray-100 cursor-pointer"),
@@ -245,8 +2832,10 @@ def render_main_page(path: str, file_list: Div):
         # Div(cls="w-full h-full ml-64 flex flex-col overflow-hidden")(
         Div(cls="ml-64 flex-1 flex flex-col overflow-hidden")(
             # Breadcrumb
-            Div(cls="w-full p-4 bg-white shadow-md")(
-                Div(cls="text-sm text-gray-600")(*breadcrumb_items)
+            Div(cls="w-full p-4 bg-white shadow-md flex justify-between")(
+                Div(cls="text-sm text-gray-600")(*breadcrumb_items),
+                Button("Find duplicates", hx_post="/_dupes", hx_vals=json.dumps({'path': path}), hx_target="#preview-area",
+                       cls="text-sm text-blue-600 hover:underline"),
             ),
             # File list and Preview area
             # Div(cls="h-full flex-grow flex p-6 overflow-hidden")(
@@ -267,15 +2856,167 @@ def render_main_page(path: str, file_list: Div):
                 )
             )
         ),
+        render_live_listing_script(),
     )
 
 
+app.add_route(Route("/_upload/{path:path}", handle_upload, methods=['GET', 'PUT']))
+
+@rt("/_hex/{path:path}")
+@profiled
+def get(path: str, offset: str = '0', find: str = '', start: str = ''):
+    full_path = resolve_path(path)
+    if full_path is None:
+        return Response("Access denied: Path is outside the allowed directory.", status_code=403)
+    if not os.path.isfile(full_path):
+        return Response("File not found", status_code=404)
+    try:
+        return render_hex_preview(full_path, parse_offset(offset), find, parse_offset(start) if start else None)
+    except ValueError:
+        return Response("Invalid offset", status_code=400)
+
+@rt("/_columnar/{path:path}")
+@profiled
+def get(path: str, columns: List[str] = None, group: int = 0):
+    full_path = resolve_path(path)
+    if full_path is None:
+        return Response("Access denied: Path is outside the allowed directory.", status_code=403)
+    mime_type = guess_type_from_content(full_path) if os.path.isfile(full_path) else None
+    if mime_type not in (PARQUET_TYPE, ARROW_TYPE) or pa is None:
+        return Response("Not a Parquet or Arrow file", status_code=400)
+    try:
+        return render_columnar_preview(full_path, mime_type, columns, group)
+    except (pa.ArrowException, OSError):
+        return render_hex_preview(full_path)
+
+@rt("/_admission")
+def get():
+    return JSONResponse({name: {'active': state['active'], 'limit': state['limit'], 'queued': state['queued'],
+                                'queue_size': state['queue_size'], 'waiting_clients': len(state['waiting']),
+                                'timeout': state['timeout'], 'admitted': state['admitted'],
+                                'rejected': state['rejected'], 'timed_out': state['timed_out']}
+                         for name, state in admission.items()})
+
+@rt("/_dupes")
+def post(path: str = ''):
+    full_path = resolve_path(path)
+    if full_path is None:
+        return Response("Access denied: Path is outside the allowed directory.", status_code=403)
+    if not os.path.isdir(full_path):
+        return Response("Folder not found", status_code=404)
+    return render_dupe_scan(start_dupe_scan(full_path))
+
+@rt("/_dupes/{scan_id}")
+def get(scan_id: str):
+    if scan_id not in dupe_scans:
+        return Response("Scan not found", status_code=404)
+    return render_dupe_scan(dupe_scans[scan_id])
+
+@rt("/_dupes/{scan_id}/cancel")
+def post(scan_id: str):
+    if scan_id not in dupe_scans:
+        return Response("Scan not found", status_code=404)
+    dupe_scans[scan_id]['cancel'].set()
+    return Response(status_code=204)
+
+@rt("/_hash/{path:path}")
+def get(path: str, hx_request: bool = False):
+    return checksum_response(path, False, hx_request)
+
+@rt("/_hash/{path:path}")
+def post(path: str, hx_request: bool = False):
+    return checksum_response(path, True, hx_request)
+
+@rt("/_profiles")
+def get(token: str = '', x_fs3_profile: str = ''):
+    if not profile_authorized(token, x_fs3_profile):
+        return Response("Not found", status_code=404)
+    return render_profiles_page(token or x_fs3_profile)
+
+@rt("/_profiles/{profile_id}")
+def get(profile_id: str, token: str = '', x_fs3_profile: str = '', format: str = ''):
+    if not profile_authorized(token, x_fs3_profile):
+        return Response("Not found", status_code=404)
+    if not re.fullmatch(r'[\w-]+', profile_id) or not os.path.exists(os.path.join(PROFILE_DIR, f"{profile_id}.folded")):
+        return Response("Profile not found", status_code=404)
+    if format == 'folded':
+        with open(os.path.join(PROFILE_DIR, f"{profile_id}.folded")) as f:
+            return Response(f.read(), media_type='text/plain',
+                            headers={'Content-Disposition': f'attachment; filename="{profile_id}.folded"'})
+    if format == 'speedscope':
+        meta = next((meta for meta in list_profiles() if meta['id'] == profile_id), None)
+        if meta is None:
+            return Response("Profile not found", status_code=404)
+        return JSONResponse(speedscope_profile(meta, read_profile_stacks(profile_id)),
+                            headers={'Content-Disposition': f'attachment; filename="{profile_id}.speedscope.json"'})
+    return render_profile(profile_id)
+
+@rt("/_live/{path:path}")
+async def get(path: str, sort: str = 'name', order: str = 'asc', folders_first: bool = False, kind: str = '',
+              min_size: str = '', max_size: str = '', after: str = '', before: str = '', page: int = 0,
+              image_columns: bool = False):
+    full_path = resolve_path(path)
+    if full_path is None:
+        return Response("Access denied: Path is outside the allowed directory.", status_code=403)
+    if not os.path.isdir(full_path):
+        return Response("Folder not found", status_code=404)
+    view = make_view(sort, order, folders_first, kind, min_size, max_size, after, before, page, image_columns)
+    return EventStream(listing_events(full_path, view))
+
+@rt("/_tail/{path:path}")
+async def get(path: str, last_event_id: str = ''):
+    full_path = resolve_path(path)
+    if full_path is None:
+        return Response("Access denied: Path is outside the allowed directory.", status_code=403)
+    if not os.path.isfile(full_path):
+        return Response("File not found", status_code=404)
+    return EventStream(tail_events(full_path, last_event_id))
+
+@rt("/_jobs")
+def post(op: str, paths: List[str] = None, dest: str = ''):
+    if op not in ('delete', 'move', 'copy'):
+        return Response(f"Unknown operation: {op}", status_code=400)
+    full_paths = [resolve_path(path) for path in paths or []]
+    if not full_paths or None in full_paths or base_dir in full_paths:
+        return Response("Access denied: Path is outside the allowed directory.", status_code=403)
+    full_paths = [path for path in full_paths if os.path.lexists(path)]
+    dest_path = None
+    if op != 'delete':
+        dest_path = resolve_path(dest)
+        if dest_path is None or not os.path.isdir(dest_path):
+            return Response("Destination must be an existing folder", status_code=400)
+        if any(dest_path == path or dest_path.startswith(path + os.sep) for path in full_paths):
+            return Response("Cannot move or copy a folder into itself", status_code=400)
+        # Nothing is ever overwritten: every selected entry must land on a name that is still free
+        names = [os.path.basename(path) for path in full_paths]
+        conflicts = sorted({name for name in names if names.count(name) > 1 or os.path.lexists(os.path.join(dest_path, name))})
+        if conflicts:
+            return Response(f"Already exists in the destination: {', '.join(conflicts)}", status_code=409)
+    job = start_job(op, full_paths, dest_path)
+    return Div(data_job=job['id'])(render_job_progress(job))
+
+@rt("/_jobs/{job_id}/events")
+async def get(job_id: str):
+    if job_id not in jobs:
+        return Response("Job not found", status_code=404)
+    return EventStream(job_events(jobs[job_id]))
+
+@rt("/_jobs/{job_id}/cancel")
+def post(job_id: str):
+    if job_id not in jobs:
+        return Response("Job not found", status_code=404)
+    jobs[job_id]['cancel'].set()
+    return Response(status_code=204)
+
 @rt("/")
 @rt("/{path:path}")
-def get(path: str = '', search: str = '', preview: bool = False, hx_request: bool = False):
-    full_path = os.path.normpath(os.path.join(base_dir, path))
-    
-    if not full_path.startswith(base_dir):
+@profiled
+def get(path: str = '', search: str = '', preview: bool = False, hx_request: bool = False,
+        sort: str = 'name', order: str = 'asc', folders_first: bool = False, kind: str = '',
+        min_size: str = '', max_size: str = '', after: str = '', before: str = '', page: int = 0,
+        image_columns: bool = False, session=None):
+    full_path = resolve_path(path)
+    if full_path is None:
         return Response("Access denied: Path is outside the allowed directory.", status_code=403)
 
     if not os.path.exists(full_path):
@@ -284,7 +3025,9 @@ def get(path: str = '', search: str = '', preview: bool = False, hx_request: boo
     if os.path.isfile(full_path):
         return handle_file(path, preview)
     else:
-        file_list = handle_directory(path, search)
+        view = make_view(sort, order, folders_first, kind, min_size, max_size, after, before, page, image_columns)
+        client_id = session.setdefault('search_client', uuid.uuid4().hex) if search else None
+        file_list = handle_directory(path, search, view, client_id)
         if search or preview or hx_request:
             return file_list
         else:
@@ -0,0 +1,64 @@
+import os
+import sys
+
+# fs3 reads the served directory from argv at import time
+sys.argv = sys.argv[:1]
+import fs3
+import pytest
+
+@pytest.fixture
+def tree(tmp_path, monkeypatch):
+    base = tmp_path / 'tree'
+    (base / 'a' / 'b').mkdir(parents=True)
+    (base / 'top.txt').write_text('top')
+    (base / 'a' / 'mid.csv').write_text('x,y\n1,2\n')
+    (base / 'a' / 'b' / 'deep.bin').write_bytes(b'\0' * 100)
+    os.symlink('a', base / 'link')
+    monkeypatch.setattr(fs3, 'base_dir', str(base))
+    monkeypatch.setattr(fs3, 'dir_cache', {})
+    monkeypatch.setattr(fs3, 'index_state', {'snapshot': None, 'dirty': False, 'ready': False, 'paths': []})
+    return base
+
+def folders(base):
+    return [str(base), str(base / 'a'), str(base / 'a' / 'b')]
+
+def test_snapshot_round_trip(tree, tmp_path):
+    listings = {path: fs3.get_directory_listing(path) for path in folders(tree)}
+    fs3.save_index_snapshot(folders(tree), str(tmp_path / 'index'))
+    snapshot = fs3.load_index_snapshot(str(tmp_path / 'index'))
+    assert snapshot['paths'] == folders(tree)
+    for path, listing in listings.items():
+        entries, links = fs3.snapshot_entries(snapshot, snapshot['dirs'][path])
+        assert sorted(entries) == sorted(listing['entries'])
+        assert links == listing['links']
+        assert snapshot['dir_mtime'][snapshot['dirs'][path]] == listing['dir_mtime']
+    assert fs3.snapshot_subfolders(snapshot, 0) == ['a']
+
+def test_untouched_folders_stay_in_the_snapshot(tree, tmp_path, monkeypatch):
+    listings = {path: fs3.get_directory_listing(path) for path in folders(tree)}
+    fs3.save_index_snapshot(folders(tree), str(tmp_path / 'index'))
+    fs3.dir_cache.clear()
+    fs3.index_state['snapshot'] = fs3.load_index_snapshot(str(tmp_path / 'index'))
+    save_index_snapshot = fs3.save_index_snapshot
+    monkeypatch.setattr(fs3, 'save_index_snapshot', lambda paths: None)
+    fs3.reconcile_index()
+    assert fs3.index_state['paths'] == folders(tree)
+    assert fs3.dir_cache == {}
+    # Re-saving copies the undecoded folders across unchanged
+    save_index_snapshot(folders(tree), str(tmp_path / 'index2'))
+    copy = fs3.load_index_snapshot(str(tmp_path / 'index2'))
+    for path, listing in listings.items():
+        assert sorted(fs3.snapshot_entries(copy, copy['dirs'][path])[0]) == sorted(listing['entries'])
+
+def test_reconcile_rescans_changed_folders(tree, tmp_path, monkeypatch):
+    for path in folders(tree):
+        fs3.get_directory_listing(path)
+    fs3.save_index_snapshot(folders(tree), str(tmp_path / 'index'))
+    fs3.dir_cache.clear()
+    fs3.index_state['snapshot'] = fs3.load_index_snapshot(str(tmp_path / 'index'))
+    monkeypatch.setattr(fs3, 'save_index_snapshot', lambda paths: None)
+    (tree / 'a' / 'c').mkdir()
+    os.utime(tree / 'a', ns=(0, 1))
+    fs3.reconcile_index()
+    assert set(fs3.dir_cache) == {str(tree / 'a'), str(tree / 'a' / 'c')}
+    assert str(tree / 'a' / 'c') in fs3.index_state['paths']
@@ -0,0 +1,42 @@
+import sys
+
+# fs3 reads the served directory from argv at import time
+sys.argv = sys.argv[:1]
+import fs3
+import pytest
+from starlette.testclient import TestClient
+
+@pytest.fixture
+def tree(tmp_path, monkeypatch):
+    base = tmp_path / 'tree'
+    base.mkdir()
+    (tmp_path / 'tree2').mkdir()
+    monkeypatch.setattr(fs3, 'base_dir', str(base))
+    return base
+
+def test_sibling_with_same_prefix_is_outside(tree):
+    assert fs3.resolve_path('../tree2/pwned.txt') is None
+    assert fs3.resolve_path('../tree') == str(tree)
+    assert fs3.resolve_path('') == str(tree)
+    assert fs3.resolve_path('a/b.txt') == str(tree / 'a' / 'b.txt')
+
+def test_upload_cannot_write_to_sibling(tree):
+    response = TestClient(fs3.app).put('/_upload/..%2Ftree2%2Fpwned.txt?upload_id=abc', content=b'x')
+    assert response.status_code == 403
+    assert not (tree.parent / 'tree2' / 'pwned.txt').exists()
+
+def test_job_cannot_delete_from_sibling(tree):
+    victim = tree.parent / 'tree2' / 'pwned.txt'
+    victim.write_text('keep')
+    response = TestClient(fs3.app).post('/_jobs', data={'op': 'delete', 'paths': '../tree2/pwned.txt'})
+    assert response.status_code == 403
+    assert victim.exists()
+
+def test_job_refuses_to_overwrite_destination(tree):
+    (tree / 'a').mkdir()
+    (tree / 'b').mkdir()
+    (tree / 'a' / 'x').write_text('new')
+    (tree / 'b' / 'x').write_text('keep')
+    response = TestClient(fs3.app).post('/_jobs', data={'op': 'copy', 'paths': 'a/x', 'dest': 'b'})
+    assert response.status_code == 409
+    assert (tree / 'b' / 'x').read_text() == 'keep'
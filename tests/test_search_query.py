@@ -0,0 +1,85 @@
+import sys
+import time
+
+# fs3 reads the served directory from argv at import time
+sys.argv = sys.argv[:1]
+import fs3
+import pytest
+
+def matches(query, kind='file', name='sales_2023.csv', path='raw/sales_2023.csv', size=2048, mtime=None):
+    return fs3.query_matches(fs3.compile_query(query), kind, name, path, size, time.time() if mtime is None else mtime)
+
+def test_plain_terms_match_the_name():
+    assert matches('sales')
+    assert matches('sales 2023')
+    assert not matches('sales 2024')
+    assert not matches('raw')
+
+def test_terms_with_a_slash_match_the_path():
+    assert matches('raw/s')
+    assert matches('path:raw/*.csv')
+    assert not matches('clean/s')
+
+def test_globs_and_regexes():
+    assert matches('*.csv')
+    assert not matches('*.json')
+    assert matches(r're:_\d{4}\.')
+
+def test_quoted_terms_keep_spaces():
+    assert matches('"q1 report"', name='q1 report.txt', path='q1 report.txt')
+    assert not matches('"q1 report"', name='q1-report.txt', path='q1-report.txt')
+
+def test_predicates():
+    assert matches('kind:csv')
+    assert not matches('type:folder')
+    assert matches('size:>1KB')
+    assert not matches('size:>1MB')
+    assert matches('modified:<7d')
+    assert not matches('modified:<7d', mtime=time.time() - 30 * 86400)
+
+@pytest.mark.parametrize('previous, new', [
+    ('r', 'ra'),
+    ('sales', 'sales 2023'),
+    ('*.csv', '*.csv sales'),
+    ('raw/', 'raw/ sales'),
+    ('"q1 rep"', '"q1 report"'),
+])
+def test_refinable(previous, new):
+    assert fs3.refinable(previous, new)
+
+@pytest.mark.parametrize('previous, new', [
+    ('', 'sales'),
+    ('raw', 'raw/'),
+    ('raw', 'raw/s'),
+    ('raw/', 'raw/s'),
+    ('sales', 'path:sales*'),
+    ('*.csv', '*.csvx'),
+    ('sales 2023', 'sales'),
+])
+def test_not_refinable(previous, new):
+    assert not fs3.refinable(previous, new)
+
+def test_typing_a_path_term_keeps_its_hits(tmp_path, monkeypatch):
+    (tmp_path / 'raw').mkdir()
+    (tmp_path / 'raw' / 'sales_2023.csv').write_text('x')
+    monkeypatch.setattr(fs3, 'base_dir', str(tmp_path))
+    monkeypatch.setattr(fs3, 'search_sessions', {})
+    monkeypatch.setattr(fs3, 'search_cache', type(fs3.search_cache)())
+    for typed in ('r', 'ra', 'raw', 'raw/', 'raw/s'):
+        results = fs3.client_search('client', str(tmp_path), typed)
+    assert [item[1] for item in results] == ['sales_2023.csv']
+
+def test_a_new_search_cancels_the_previous_walk_before_queueing(tmp_path, monkeypatch):
+    from starlette.testclient import TestClient
+    monkeypatch.setattr(fs3, 'base_dir', str(tmp_path))
+    monkeypatch.setattr(fs3, 'search_sessions', {})
+    client = TestClient(fs3.app)
+    client.get('/', params={'search': 'a'})
+    client_id, = fs3.search_sessions
+    cookie = f"{fs3.app.session_cookie}={client.cookies.get(fs3.app.session_cookie)}"
+    scope = {'type': 'http', 'headers': [(b'cookie', cookie.encode())]}
+    assert fs3.session_search_client(scope) == client_id
+    generation = fs3.search_sessions[client_id]['generation']
+    fs3.cancel_client_search(client_id)
+    assert fs3.search_sessions[client_id]['generation'] == generation + 1
+    assert fs3.session_search_client({'type': 'http', 'headers': [(b'cookie', b'session_=forged')]}) is None